@@ -0,0 +1,286 @@
+"""Local stand-ins for Gemini, GCS and Twilio, injected at the SDK-client level.
+
+Requests still go through our own code and, for Twilio, the real SDK request
+and response handling; only the network hop is replaced. Every fake takes a
+``Faults`` describing injected latency and error rate.
+"""
+
+import json
+import time
+import random
+import asyncio
+import threading
+
+from google.genai import types
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.http.response import Response as TwilioResponse
+from twilio.rest import Client as TwilioClient
+
+# 24 kHz, 16-bit mono PCM, as Gemini TTS returns it
+TTS_BYTES_PER_CHAR = 24000 * 2 // 15
+
+FAKE_JSON_REPLY = json.dumps(
+    {
+        "category": "OTHER",
+        "sentimentAnalysis": "neutral",
+        "sentimentBrief": "Caller asked a general question",
+    }
+)
+
+
+class FakeUpstreamError(Exception):
+    """Raised by a fake to simulate an upstream failure."""
+
+
+class Faults:
+    """Injected latency (mean +/- jitter, in ms) and error probability."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self) -> float:
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def failed(self) -> bool:
+        return random.random() < self.error_rate
+
+    async def apply(self, what: str):
+        await asyncio.sleep(self.delay())
+        if self.failed():
+            raise FakeUpstreamError(f"Injected {what} failure")
+
+    def apply_sync(self, what: str):
+        time.sleep(self.delay())
+        if self.failed():
+            raise FakeUpstreamError(f"Injected {what} failure")
+
+
+# Gemini
+
+
+def text_response(text):
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=[types.Part(text=text)])
+            )
+        ]
+    )
+
+
+def audio_response(pcm):
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(
+                    role="model",
+                    parts=[
+                        types.Part(
+                            inline_data=types.Blob(
+                                data=pcm, mime_type="audio/L16;codec=pcm;rate=24000"
+                            )
+                        )
+                    ],
+                )
+            )
+        ]
+    )
+
+
+def is_audio_request(config):
+    return bool(config and config.response_modalities and "AUDIO" in config.response_modalities)
+
+
+def is_json_request(config):
+    return bool(config and config.response_mime_type == "application/json")
+
+
+def prompt_text(contents):
+    return " ".join(str(item) for item in contents)
+
+
+class FakeGeminiModels:
+    def __init__(self, text_faults, tts_faults, stream_chunks=8, chunk_gap_ms=20):
+        self.text_faults = text_faults
+        self.tts_faults = tts_faults
+        self.stream_chunks = stream_chunks
+        self.chunk_gap_ms = chunk_gap_ms
+
+    async def generate_content(self, model, contents, config=None):
+        if is_audio_request(config):
+            await self.tts_faults.apply("Gemini TTS")
+            return audio_response(b"\x01\x00" * (len(prompt_text(contents)) * TTS_BYTES_PER_CHAR // 2))
+        await self.text_faults.apply("Gemini")
+        text = prompt_text(contents)
+        if is_json_request(config):
+            return text_response(FAKE_JSON_REPLY)
+        return text_response(f"Fake reply to: {text[:200]}")
+
+    async def generate_content_stream(self, model, contents, config=None):
+        audio = is_audio_request(config)
+        json_reply = is_json_request(config)
+        faults = self.tts_faults if audio else self.text_faults
+        # Time to first chunk is the injected latency; later chunks are paced
+        await faults.apply("Gemini stream")
+
+        async def chunks():
+            for index in range(self.stream_chunks):
+                if index:
+                    await asyncio.sleep(self.chunk_gap_ms / 1000)
+                if audio:
+                    yield audio_response(b"\x01\x00" * 4800)
+                elif json_reply:
+                    size = -(-len(FAKE_JSON_REPLY) // self.stream_chunks)
+                    yield text_response(FAKE_JSON_REPLY[index * size : (index + 1) * size])
+                else:
+                    yield text_response(f"token{index} ")
+
+        return chunks()
+
+    async def get(self, model):
+        return types.Model(name=model)
+
+
+class FakeGeminiClient:
+    """Mimics ``genai.Client`` for the calls google_calls makes."""
+
+    def __init__(self, text_faults, tts_faults):
+        async def aclose():
+            pass
+
+        self.aio = type("AsyncClient", (), {})()
+        self.aio.models = FakeGeminiModels(text_faults, tts_faults)
+        self.aio.aclose = aclose
+
+
+# Google Cloud Storage
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = None
+        self.content_type = None
+
+    def upload_from_file(self, file_obj, content_type=None, size=None, **kwargs):
+        self.bucket.faults.apply_sync("GCS upload")
+        self.bucket.store(self.name, len(file_obj.read()))
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        self.bucket.faults.apply_sync("GCS upload")
+        self.bucket.store(self.name, len(data))
+
+    def compose(self, sources):
+        self.bucket.faults.apply_sync("GCS compose")
+        self.bucket.store(self.name, sum(self.bucket.objects[s.name] for s in sources))
+
+    def delete(self):
+        self.bucket.objects.pop(self.name, None)
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def generate_signed_url(self, version=None, expiration=None, method="GET"):
+        # Signing is local CPU work in the real client too, so no latency
+        return f"https://storage.example/{self.bucket.name}/{self.name}?sig=fake"
+
+
+class FakeBucket:
+    """In-memory bucket that only remembers object sizes."""
+
+    def __init__(self, faults, name="bench-bucket"):
+        self.faults = faults
+        self.name = name
+        self.location = "LOCAL"
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def store(self, name, size):
+        with self._lock:
+            self.objects[name] = size
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def reload(self):
+        pass
+
+
+# Twilio
+
+
+class FakeTwilioHttpClient(AsyncTwilioHttpClient):
+    """Answers Twilio REST requests locally.
+
+    Injected failures come back as 429s, so the SDK raises the same
+    exception and our retry logic sees the same status code as in production.
+    """
+
+    def __init__(self, faults):
+        # No aiohttp session: nothing goes over the network
+        super().__init__(pool_connections=False)
+        self.faults = faults
+        self.calls = {}
+        self._counter = 0
+
+    async def request(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        headers=None,
+        auth=None,
+        timeout=None,
+        allow_redirects=False,
+    ):
+        await asyncio.sleep(self.faults.delay())
+        if self.faults.failed():
+            return TwilioResponse(
+                429,
+                json.dumps({"code": 20429, "message": "Too Many Requests", "status": 429}),
+            )
+
+        account_sid = auth[0] if auth else "AC" + "0" * 32
+        if method == "POST" and url.endswith("/Calls.json"):
+            self._counter += 1
+            call_sid = f"CA{self._counter:032d}"
+            self.calls[call_sid] = {
+                "sid": call_sid,
+                "account_sid": account_sid,
+                "to": (data or {}).get("To"),
+                "from": (data or {}).get("From"),
+                "status": "queued",
+            }
+            return TwilioResponse(201, json.dumps(self.calls[call_sid]))
+        if method == "GET" and "/Calls/" in url:
+            call_sid = url.rsplit("/", 1)[1].split(".")[0]
+            call = self.calls.get(call_sid)
+            if call is None:
+                return TwilioResponse(
+                    404, json.dumps({"code": 20404, "message": "Not found", "status": 404})
+                )
+            return TwilioResponse(200, json.dumps(call))
+        return TwilioResponse(
+            200, json.dumps({"sid": account_sid, "status": "active", "type": "Trial"})
+        )
+
+
+def install_fakes(gemini_faults, tts_faults, gcs_faults, twilio_faults):
+    """Point google_calls and twilio_calls at the fakes (call before startup)."""
+    import google_calls
+    import twilio_calls
+
+    google_calls.gemini_client = FakeGeminiClient(gemini_faults, tts_faults)
+    google_calls.storage_bucket = FakeBucket(gcs_faults)
+
+    twilio_calls.twilio_http_client = FakeTwilioHttpClient(twilio_faults)
+    twilio_calls.client = TwilioClient(
+        twilio_calls.account_sid,
+        twilio_calls.auth_token,
+        http_client=twilio_calls.twilio_http_client,
+    )
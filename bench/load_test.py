@@ -0,0 +1,275 @@
+"""Offline load test for the API.
+
+Starts ``bench/serve_fakes.py`` (the app wired to local Gemini, GCS and
+Twilio fakes), drives each scenario at a fixed concurrency for a fixed time
+and reports, per scenario:
+
+* throughput and error count
+* client-side p50/p95/p99 latency
+* server event-loop lag (p50/p99/max) and RSS
+
+Run from the repository root:
+
+    python bench/load_test.py --concurrency 20 --duration 15
+    python bench/load_test.py --scenarios gemini gcs_upload --error-rate 0.02
+
+Pass ``--url`` to drive an already running server instead; it needs the
+``/bench/stats`` route from serve_fakes.py for the loop-lag and RSS columns.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "bench", "serve_fakes.py")
+
+STATUS_SEQUENCE = ["initiated", "ringing", "in-progress", "completed"]
+
+
+def unique_prompt():
+    # Unique text so the TTS and response caches never hide upstream latency
+    return f"Say hello to caller {uuid.uuid4().hex[:12]}"
+
+
+async def gemini(client, ctx):
+    return await client.post("/gemini", json={"prompt": unique_prompt()})
+
+
+async def gemini_stream(client, ctx):
+    async with client.stream(
+        "POST", "/gemini/stream", json={"prompt": unique_prompt()}
+    ) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event: error"):
+                raise RuntimeError("stream reported an error")
+    return response
+
+
+async def gemini_audio(client, ctx):
+    return await client.post(
+        "/gemini/audio",
+        json={"prompt": unique_prompt(), "output_format": "wav_mulaw_8k"},
+    )
+
+
+async def gcs_upload(client, ctx):
+    # Random bytes so content-hash deduplication never skips the upload
+    body = os.urandom(ctx["upload_bytes"])
+    return await client.post(
+        "/gcs/upload", files={"file": ("bench.wav", body, "audio/wav")}
+    )
+
+
+async def twilio_call(client, ctx):
+    response = await client.post(
+        "/twilio/call",
+        json={
+            "to_phone_number": "+15005550006",
+            "audio_file_url": "https://storage.example/bench.wav",
+        },
+    )
+    # Twilio failures come back as 200 with success=false
+    if response.status_code == 200 and not response.json().get("success"):
+        raise RuntimeError(response.json().get("error"))
+    return response
+
+
+async def status_callback(client, ctx):
+    # Walk a pool of call SIDs through their status progression
+    ctx["callbacks"] += 1
+    n = ctx["callbacks"]
+    call_sid = f"CA{n % 500:032d}"
+    sequence = n // 500
+    return await client.post(
+        "/twilio/call/status",
+        data={
+            "CallSid": call_sid,
+            "CallStatus": STATUS_SEQUENCE[sequence % len(STATUS_SEQUENCE)],
+            "SequenceNumber": str(sequence),
+        },
+    )
+
+
+SCENARIOS = {
+    "gemini": gemini,
+    "gemini_stream": gemini_stream,
+    "gemini_audio": gemini_audio,
+    "gcs_upload": gcs_upload,
+    "twilio_call": twilio_call,
+    "status_callback": status_callback,
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return round(sorted_values[index] * 1000, 1)
+
+
+async def run_scenario(client, name, concurrency, duration, ctx):
+    scenario = SCENARIOS[name]
+    latencies = []
+    errors = {}
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, ctx)
+                if response.status_code >= 400:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                key = str(e)[:80] or type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+
+    await client.get("/bench/stats", params={"reset": "true"})
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    server = (await client.get("/bench/stats")).json()
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "loop_lag_ms": server.get("loop_lag_ms"),
+        "rss_mb": server.get("rss_mb"),
+        "peak_rss_mb": server.get("peak_rss_mb"),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    command = [
+        sys.executable,
+        SERVER,
+        "--port", str(port),
+        "--gemini-latency-ms", str(args.gemini_latency_ms),
+        "--tts-latency-ms", str(args.tts_latency_ms),
+        "--gcs-latency-ms", str(args.gcs_latency_ms),
+        "--twilio-latency-ms", str(args.twilio_latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+    ]
+    process = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Fake server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise SystemExit("Fake server did not become healthy within 60s")
+
+
+def print_table(results):
+    header = (
+        f"{'scenario':<16} {'req/s':>8} {'ok':>7} {'errors':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'lag p99':>8} {'lag max':>8} {'rss MB':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lag = r["loop_lag_ms"] or {}
+        print(
+            f"{r['scenario']:<16} {r['rps']:>8} {r['requests']:>7} {r['errors']:>7} "
+            f"{r['p50_ms'] or '-':>8} {r['p95_ms'] or '-':>8} {r['p99_ms'] or '-':>8} "
+            f"{lag.get('p99') or '-':>8} {lag.get('max') or '-':>8} "
+            f"{r['rss_mb'] or '-':>7}"
+        )
+    for r in results:
+        for kind, count in r["error_kinds"].items():
+            print(f"  {r['scenario']}: {count} x {kind}")
+
+
+async def run(args, url):
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    results = []
+    ctx = {"upload_bytes": args.upload_kb * 1024, "callbacks": random.randrange(10**6)}
+    async with httpx.AsyncClient(
+        base_url=url,
+        headers={"Authorization": f"Bearer {args.api_key}"},
+        limits=limits,
+        timeout=args.timeout,
+    ) as client:
+        for name in args.scenarios:
+            print(f"Running {name} ({args.concurrency} users, {args.duration}s)...")
+            results.append(
+                await run_scenario(client, name, args.concurrency, args.duration, ctx)
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--api-key", default="bench")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--gemini-latency-ms", type=float, default=200)
+    parser.add_argument("--tts-latency-ms", type=float, default=800)
+    parser.add_argument("--gcs-latency-ms", type=float, default=100)
+    parser.add_argument("--twilio-latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+    try:
+        results = asyncio.run(run(args, url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
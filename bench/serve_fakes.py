@@ -0,0 +1,154 @@
+"""Run the API against local fakes of Gemini, GCS and Twilio.
+
+Nothing leaves the machine: the SDK clients in google_calls and twilio_calls
+are replaced by the stand-ins in ``bench/fakes.py`` before startup. Each
+upstream gets its own injected latency, plus shared jitter and error rate:
+
+    python bench/serve_fakes.py --port 8090 --gemini-latency-ms 300 --error-rate 0.01
+
+The server also exposes ``GET /bench/stats`` (event-loop lag and RSS since
+the last ``?reset=true``), which ``bench/load_test.py`` reads between
+scenarios.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# How often the lag monitor wakes up; lag is how late it wakes
+LAG_INTERVAL = 0.01
+
+
+def bench_env():
+    """Point the app at fake credentials and throwaway local state."""
+    state_dir = tempfile.mkdtemp(prefix="answering-machine-bench-")
+    defaults = {
+        "GEMINI_API_KEY": "bench",
+        "GCS_STORAGE_BUCKET": "bench-bucket",
+        "SERVICE_ACCOUNT_KEY_JSON": "",
+        "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+        "TWILIO_AUTH_TOKEN": "bench",
+        "TWILIO_PHONE_NUMBER": "+15005550006",
+        "RICK_ROLL_API_KEY": "bench",
+        "STARTUP_MODE": "eager",
+        "STARTUP_WARMUP": "false",
+        "LOG_SAMPLE_RATE": "0",
+        "CALL_STORE_PATH": os.path.join(state_dir, "calls.db"),
+        "TTS_CACHE_DIR": os.path.join(state_dir, "tts"),
+        "UPLOAD_INDEX_PATH": os.path.join(state_dir, "uploads.db"),
+        "DEV_API_KEY_PATH": os.path.join(state_dir, "dev_api_key"),
+        "METRICS_DIR": os.path.join(state_dir, "metrics"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    # Callbacks would point back at a real deployment
+    os.environ.pop("API_URL", None)
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop runs a timer scheduled LAG_INTERVAL ahead."""
+
+    def __init__(self):
+        self.samples = []
+        self.started = time.monotonic()
+
+    async def run(self):
+        while True:
+            expected = time.perf_counter() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            self.samples.append(max(0.0, time.perf_counter() - expected))
+
+    def stats(self, reset=False):
+        samples = sorted(self.samples)
+        result = {
+            "window_seconds": round(time.monotonic() - self.started, 2),
+            "loop_lag_ms": {
+                "samples": len(samples),
+                "p50": percentile_ms(samples, 50),
+                "p99": percentile_ms(samples, 99),
+                "max": round(samples[-1] * 1000, 2) if samples else None,
+            },
+            "rss_mb": current_rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        if reset:
+            self.samples = []
+            self.started = time.monotonic()
+        return result
+
+
+def percentile_ms(samples, pct):
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(len(samples) * pct / 100))
+    return round(samples[index] * 1000, 2)
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in KiB on Linux and bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+async def serve(args):
+    import uvicorn
+    from fakes import Faults, install_fakes
+
+    import main
+
+    install_fakes(
+        gemini_faults=Faults(args.gemini_latency_ms, args.jitter_ms, args.error_rate),
+        tts_faults=Faults(args.tts_latency_ms, args.jitter_ms, args.error_rate),
+        gcs_faults=Faults(args.gcs_latency_ms, args.jitter_ms, args.error_rate),
+        twilio_faults=Faults(args.twilio_latency_ms, args.jitter_ms, args.error_rate),
+    )
+
+    monitor = LoopLagMonitor()
+
+    @main.app.get("/bench/stats", include_in_schema=False)
+    async def bench_stats(reset: bool = False):
+        return monitor.stats(reset=reset)
+
+    server = uvicorn.Server(
+        uvicorn.Config(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+    )
+    monitor_task = asyncio.create_task(monitor.run())
+    try:
+        await server.serve()
+    finally:
+        monitor_task.cancel()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--gemini-latency-ms", type=float, default=200)
+    parser.add_argument("--tts-latency-ms", type=float, default=800)
+    parser.add_argument("--gcs-latency-ms", type=float, default=100)
+    parser.add_argument("--twilio-latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    bench_env()
+    asyncio.run(serve(cli_args))
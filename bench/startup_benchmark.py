@@ -0,0 +1,155 @@
+"""Cold-start benchmark for the API.
+
+For each startup mode this reports:
+
+* per-module import time, from ``python -X importtime -c "import main"``
+* time from spawning uvicorn to the first healthy ``GET /health``
+
+Run from the repository root:
+
+    python bench/startup_benchmark.py --runs 5 --modes eager lazy
+
+Upstream credentials are not needed (and are blanked by default so no
+network warm-up skews the numbers); pass ``--keep-env`` to measure with the
+real environment.
+"""
+
+import os
+import re
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+# Modules worth calling out in the import-time breakdown
+WATCHED_MODULES = [
+    "main",
+    "fastapi",
+    "pydantic",
+    "google_calls",
+    "audio_formats",
+    "numpy",
+    "google.genai",
+    "google.cloud.storage",
+    "google.auth",
+    "twilio_calls",
+    "twilio.rest",
+    "call_store",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\s*)(\S+)")
+
+
+def child_env(mode, keep_env):
+    env = dict(os.environ)
+    if not keep_env:
+        for name in (
+            "GEMINI_API_KEY",
+            "SERVICE_ACCOUNT_KEY_JSON",
+            "GCS_STORAGE_BUCKET",
+            "TWILIO_ACCOUNT_SID",
+            "TWILIO_AUTH_TOKEN",
+            "TWILIO_PHONE_NUMBER",
+        ):
+            env[name] = ""
+        env.setdefault("RICK_ROLL_API_KEY", "benchmark")
+    env["STARTUP_MODE"] = mode
+    env["PYTHONPATH"] = SRC
+    env["WEB_CONCURRENCY"] = "1"
+    return env
+
+
+def import_times(env):
+    """Cumulative import time in ms of each top-level-or-watched module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative_us, module = int(match.group(2)), match.group(4)
+            times[module] = max(times.get(module, 0), cumulative_us / 1000)
+    return times
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_healthy(env, timeout=60.0):
+    """Seconds from spawning uvicorn until GET /health returns 200."""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before becoming healthy")
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{port}/health", timeout=1
+                ) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"/health not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["eager", "lazy"])
+    parser.add_argument("--keep-env", action="store_true")
+    args = parser.parse_args()
+
+    summary = {}
+    for mode in args.modes:
+        env = child_env(mode, args.keep_env)
+        imports = [import_times(env) for _ in range(args.runs)]
+        healthy = [time_to_healthy(env) for _ in range(args.runs)]
+
+        print(f"\n== STARTUP_MODE={mode} ({args.runs} runs, medians) ==")
+        print(f"{'module':<24}{'cumulative import ms':>22}")
+        for module in WATCHED_MODULES:
+            samples = [run.get(module) for run in imports]
+            if all(sample is None for sample in samples):
+                print(f"{module:<24}{'not imported':>22}")
+            else:
+                value = statistics.median(sample or 0 for sample in samples)
+                print(f"{module:<24}{value:>22.1f}")
+        summary[mode] = statistics.median(healthy)
+        print(f"time to first healthy /health: {summary[mode] * 1000:.0f} ms")
+
+    if len(summary) > 1:
+        print("\n== summary ==")
+        for mode, seconds in summary.items():
+            print(f"{mode:<8}{seconds * 1000:>8.0f} ms to healthy")
+
+
+if __name__ == "__main__":
+    main()
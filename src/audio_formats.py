@@ -0,0 +1,195 @@
+import io
+import os
+import wave
+import struct
+import shutil
+import asyncio
+import numpy as np
+from fastapi import HTTPException
+
+# Supported output formats and their media types
+OUTPUT_FORMATS = {
+    "wav": "audio/wav",  # 24 kHz 16-bit PCM, Gemini's native output
+    "wav_mulaw_8k": "audio/wav",  # 8 kHz G.711 mu-law, what a phone call carries
+    "mp3": "audio/mpeg",  # Narrowband MP3 for storage and Twilio <Play>
+}
+FILE_EXTENSIONS = {"wav": ".wav", "wav_mulaw_8k": ".wav", "mp3": ".mp3"}
+
+TELEPHONY_SAMPLE_RATE = 8000
+MP3_SAMPLE_RATE = int(os.getenv("MP3_SAMPLE_RATE", "16000"))
+MP3_BITRATE = os.getenv("MP3_BITRATE", "32k")
+
+# G.711 mu-law constants
+MULAW_BIAS = 0x84
+MULAW_CLIP = 32635
+
+
+def create_wav_from_pcm(pcm_data, channels=1, rate=24000, sample_width=2):
+    """Create WAV file data from PCM data following Google's recommended approach."""
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm_data)
+    return wav_buffer.getvalue()
+
+
+def wav_stream_header(channels=1, rate=24000, sample_width=2):
+    """WAV header for audio of unknown length, sent before the PCM is produced.
+
+    The RIFF and data chunk sizes are set to the maximum value, which
+    streaming-aware players treat as "read until end of stream".
+    """
+    block_align = channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        0xFFFFFFFF,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        channels,
+        rate,
+        rate * block_align,
+        block_align,
+        sample_width * 8,
+        b"data",
+        0xFFFFFFFF,
+    )
+
+
+def create_mulaw_wav(mulaw_data, channels=1, rate=TELEPHONY_SAMPLE_RATE):
+    """Wrap G.711 mu-law samples in a WAV container (format tag 7)."""
+    padding = b"\x00" * (len(mulaw_data) % 2)
+    fmt_chunk = struct.pack(
+        "<4sIHHIIHHH", b"fmt ", 18, 7, channels, rate, rate * channels, channels, 8, 0
+    )
+    fact_chunk = struct.pack("<4sII", b"fact", 4, len(mulaw_data) // channels)
+    data_chunk = struct.pack("<4sI", b"data", len(mulaw_data)) + mulaw_data + padding
+    body = b"WAVE" + fmt_chunk + fact_chunk + data_chunk
+    return struct.pack("<4sI", b"RIFF", len(body)) + body
+
+
+def read_wav_pcm(wav_data):
+    """Decode a 16-bit PCM WAV file into mono PCM and its sample rate."""
+    try:
+        with wave.open(io.BytesIO(wav_data), "rb") as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            rate = wf.getframerate()
+            frames = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Unsupported WAV file: {e}")
+    if sample_width != 2:
+        raise ValueError("Only 16-bit PCM WAV files can be converted")
+    if channels > 1:
+        samples = np.frombuffer(frames, dtype="<i2").reshape(-1, channels)
+        frames = samples.mean(axis=1).astype("<i2").tobytes()
+    return frames, rate
+
+
+def lowpass_kernel(cutoff, taps=63):
+    """Hamming-windowed sinc low-pass filter; cutoff is a fraction of the sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return kernel / kernel.sum()
+
+
+def resample_pcm16(pcm_data, src_rate, dst_rate):
+    """Resample 16-bit mono PCM, low-pass filtering first when downsampling."""
+    if src_rate == dst_rate or not pcm_data:
+        return pcm_data
+    samples = np.frombuffer(pcm_data, dtype="<i2").astype(np.float32)
+    if dst_rate < src_rate:
+        # Cut just below the new Nyquist frequency to avoid aliasing
+        cutoff = 0.45 * dst_rate / src_rate
+        samples = np.convolve(samples, lowpass_kernel(cutoff), mode="same")
+    if src_rate % dst_rate == 0:
+        resampled = samples[:: src_rate // dst_rate]
+    else:
+        count = int(len(samples) * dst_rate / src_rate)
+        positions = np.arange(count) * (src_rate / dst_rate)
+        resampled = np.interp(positions, np.arange(len(samples)), samples)
+    return np.clip(np.round(resampled), -32768, 32767).astype("<i2").tobytes()
+
+
+def pcm16_to_mulaw(pcm_data):
+    """G.711 mu-law compand 16-bit PCM, vectorized over the whole buffer."""
+    samples = np.frombuffer(pcm_data, dtype="<i2").astype(np.int32)
+    sign = (samples < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(samples), MULAW_CLIP) + MULAW_BIAS
+    exponent = np.clip(np.floor(np.log2(magnitude)).astype(np.int32) - 7, 0, 7)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+async def pcm16_to_mp3(pcm_data, rate):
+    """Encode 16-bit mono PCM as MP3 with ffmpeg."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise HTTPException(status_code=500, detail="ffmpeg is required for mp3 output")
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-f",
+        "s16le",
+        "-ar",
+        str(rate),
+        "-ac",
+        "1",
+        "-i",
+        "pipe:0",
+        "-b:a",
+        MP3_BITRATE,
+        "-f",
+        "mp3",
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    mp3_data, stderr = await process.communicate(pcm_data)
+    if process.returncode != 0:
+        raise HTTPException(
+            status_code=500, detail=f"MP3 encoding failed: {stderr.decode().strip()}"
+        )
+    return mp3_data
+
+
+def validate_output_format(output_format):
+    """Return the output format, defaulting to WAV, or raise a 400."""
+    output_format = output_format or "wav"
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported output format. Choose one of: {', '.join(OUTPUT_FORMATS)}",
+        )
+    return output_format
+
+
+async def encode_audio(pcm_data, output_format="wav", rate=24000):
+    """Encode 16-bit mono PCM in the requested output format."""
+    if output_format == "wav":
+        return create_wav_from_pcm(pcm_data, rate=rate)
+    if output_format == "wav_mulaw_8k":
+        # Resampling is CPU-bound, so keep it off the event loop
+        narrowband = await asyncio.to_thread(
+            resample_pcm16, pcm_data, rate, TELEPHONY_SAMPLE_RATE
+        )
+        return create_mulaw_wav(pcm16_to_mulaw(narrowband))
+    if output_format == "mp3":
+        narrowband = await asyncio.to_thread(
+            resample_pcm16, pcm_data, rate, MP3_SAMPLE_RATE
+        )
+        return await pcm16_to_mp3(narrowband, MP3_SAMPLE_RATE)
+    raise HTTPException(status_code=400, detail=f"Unsupported output format: {output_format}")
+
+
+async def transcode_wav(wav_data, output_format):
+    """Convert an uploaded 16-bit PCM WAV file to another output format."""
+    pcm_data, rate = read_wav_pcm(wav_data)
+    return await encode_audio(pcm_data, output_format, rate=rate)
@@ -0,0 +1,289 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# TTS cache sizing (memory tier is per worker, disk tier is shared)
+TTS_CACHE_MEMORY_ITEMS = int(os.getenv("TTS_CACHE_MEMORY_ITEMS", "256"))
+TTS_CACHE_MEMORY_BYTES = int(
+    os.getenv("TTS_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024))
+)
+# The disk tier is off unless TTS_CACHE_DISK_BYTES is set: on Cloud Run /tmp
+# is an in-memory filesystem that counts against the container's memory
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "/tmp/answering-machine/tts-cache")
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", "0"))
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    The work runs in its own task, so a caller that gets cancelled (e.g. a
+    client disconnecting) doesn't cancel the result for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key, fn):
+        """Run ``fn()`` once per key; returns ``(result, shared)``."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), shared
+
+
+class LRUCache:
+    """In-memory LRU bounded by both item count and total byte size."""
+
+    def __init__(self, max_items, max_bytes):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.total_bytes -= len(old)
+        self._data[key] = value
+        self.total_bytes += len(value)
+        while len(self._data) > self.max_items or self.total_bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.total_bytes -= len(evicted)
+            self.evictions += 1
+
+
+class TTLCache:
+    """LRU cache whose entries expire after a per-entry time-to-live."""
+
+    def __init__(self, max_items, default_ttl=60.0):
+        self.max_items = max_items
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self._data),
+        }
+
+
+class DiskCache:
+    """Size-capped directory of content-addressed blobs, evicted oldest-first.
+
+    Files are written atomically so several workers can share one directory.
+    Reads bump the file mtime, which makes eviction approximately LRU.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.total_bytes += len(value)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Rescan so the cap holds even when other workers share the directory
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+        self.total_bytes = total
+
+
+def normalize_tts_text(text: str) -> str:
+    """Normalize text so trivially different scripts share a cache entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def tts_cache_key(text: str, voice_name: str, model: str, output_format: str) -> str:
+    """Content address for a synthesized clip."""
+    parts = [normalize_tts_text(text), voice_name, model, output_format]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Two-tier (memory + disk) cache of synthesized audio with single-flight."""
+
+    def __init__(
+        self,
+        max_items=TTS_CACHE_MEMORY_ITEMS,
+        max_memory_bytes=TTS_CACHE_MEMORY_BYTES,
+        directory=TTS_CACHE_DIR,
+        max_disk_bytes=TTS_CACHE_DISK_BYTES,
+    ):
+        self.memory = LRUCache(max_items, max_memory_bytes)
+        self.disk = None
+        if max_disk_bytes:
+            try:
+                self.disk = DiskCache(directory, max_disk_bytes)
+            except OSError as e:
+                print(f"TTS disk cache disabled, cannot use {directory}: {e}")
+        self.flights = SingleFlight()
+        self.disk_errors = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.synthesis_seconds = 0.0
+
+    async def lookup(self, key):
+        """Return cached audio for ``key`` without synthesizing, or None."""
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory_hits += 1
+            return data
+        if self.disk is not None:
+            # The disk tier is best-effort; errors count as a miss
+            try:
+                data = await asyncio.to_thread(self.disk.get, key)
+            except OSError as e:
+                self.disk_errors += 1
+                print(f"TTS disk cache read failed: {e}")
+                data = None
+            if data is not None:
+                self.disk_hits += 1
+                self.memory.put(key, data)
+                return data
+        return None
+
+    async def get_or_create(self, key, producer):
+        """Return cached audio for ``key``, calling ``producer()`` on a miss."""
+        data = await self.lookup(key)
+        if data is not None:
+            return data
+
+        async def produce():
+            started = time.perf_counter()
+            result = await producer()
+            self.synthesis_seconds += time.perf_counter() - started
+            self.memory.put(key, result)
+            if self.disk is not None:
+                # A full or read-only disk must not fail a finished synthesis
+                try:
+                    await asyncio.to_thread(self.disk.put, key, result)
+                except OSError as e:
+                    self.disk_errors += 1
+                    print(f"TTS disk cache write failed: {e}")
+            return result
+
+        data, shared = await self.flights.do(key, produce)
+        if shared:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        return data
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses + self.coalesced
+        hits = self.memory_hits + self.disk_hits + self.coalesced
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "in_flight": len(self.flights),
+            "synthesis_seconds": round(self.synthesis_seconds, 3),
+            "memory_items": len(self.memory),
+            "memory_bytes": self.memory.total_bytes,
+            "memory_evictions": self.memory.evictions,
+            "disk_bytes": self.disk.total_bytes if self.disk else 0,
+            "disk_evictions": self.disk.evictions if self.disk else 0,
+            "disk_errors": self.disk_errors,
+        }
@@ -0,0 +1,162 @@
+import os
+import asyncio
+from collections import OrderedDict, deque
+from fastapi.responses import StreamingResponse
+
+from callbacks import TERMINAL_STATUSES
+from sse import SSE_HEADERS, SSE_HEARTBEAT_INTERVAL, sse_event
+
+# Events buffered per subscriber; a slow client loses the oldest ones first
+CALL_EVENTS_BUFFER = int(os.getenv("CALL_EVENTS_BUFFER", "100"))
+# Calls whose last published (rank, sequence) is remembered to drop stale events
+CALL_EVENTS_TRACKED_CALLS = int(os.getenv("CALL_EVENTS_TRACKED_CALLS", "10000"))
+# How often each worker checks the shared store for events applied elsewhere
+CALL_EVENTS_POLL_INTERVAL = float(os.getenv("CALL_EVENTS_POLL_INTERVAL", "0.25"))
+
+ALL_CALLS = "*"
+
+
+class Subscription:
+    """One subscriber's bounded event buffer."""
+
+    def __init__(self, key, maxlen=CALL_EVENTS_BUFFER):
+        self.key = key
+        self.events = deque(maxlen=maxlen)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        self._ready.set()
+
+    async def next(self, timeout=None):
+        """Next event, or None if nothing arrives within ``timeout`` seconds."""
+        if not self.events:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.events.popleft()
+
+
+class CallEventBroker:
+    """In-process pub/sub of call status changes.
+
+    Subscribers follow one call SID or every call (ALL_CALLS). Publishing
+    never blocks: each subscriber has a bounded buffer that drops its oldest
+    event when full.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.published = 0
+        self.stale = 0
+        self.dropped = 0
+        self._last_seen = OrderedDict()
+
+    def subscribe(self, call_sid=None) -> Subscription:
+        subscription = Subscription(call_sid or ALL_CALLS)
+        self.subscribers.setdefault(subscription.key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.subscribers.get(subscription.key)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.key]
+        self.dropped += subscription.dropped
+
+    def publish(self, event: dict):
+        """Fan a status event out, skipping ones that don't move the call forward."""
+        call_sid = event["call_sid"]
+        order = (event["rank"], event["sequence"])
+        last = self._last_seen.get(call_sid)
+        if last is not None and order <= last:
+            self.stale += 1
+            return
+        self._last_seen[call_sid] = order
+        self._last_seen.move_to_end(call_sid)
+        while len(self._last_seen) > CALL_EVENTS_TRACKED_CALLS:
+            self._last_seen.popitem(last=False)
+
+        self.published += 1
+        for key in (call_sid, ALL_CALLS):
+            for subscription in self.subscribers.get(key, ()):
+                subscription.push(event)
+
+    def stats(self):
+        return {
+            "subscribers": sum(len(subs) for subs in self.subscribers.values()),
+            "published": self.published,
+            "stale": self.stale,
+            "dropped": self.dropped
+            + sum(sub.dropped for subs in self.subscribers.values() for sub in subs),
+        }
+
+
+async def relay_store_events(broker: CallEventBroker, call_store):
+    """Publish status events committed by any worker to this worker's subscribers.
+
+    Used with a shared call store, where a callback may be applied by a
+    different process than the one holding the SSE connection.
+    """
+    last_id = await call_store.last_event_id()
+    while True:
+        await asyncio.sleep(CALL_EVENTS_POLL_INTERVAL)
+        try:
+            for event_id, event in await call_store.read_events(last_id):
+                last_id = event_id
+                broker.publish(event)
+        except Exception as e:
+            print(f"Failed to read call events: {e}")
+
+
+def public_event(event: dict) -> dict:
+    return {
+        field: event.get(field)
+        for field in (
+            "call_sid",
+            "status",
+            "updated_at",
+            "duration",
+            "price",
+            "error_message",
+        )
+    }
+
+
+def stream_call_events(broker, request, call_sid=None, snapshot=None):
+    """SSE response following one call (until it finishes) or all calls.
+
+    ``snapshot()`` may return the current record, which is sent first so a
+    client that subscribes mid-call starts from the latest known status.
+    """
+
+    async def event_stream():
+        subscription = broker.subscribe(call_sid)
+        try:
+            record = await snapshot() if snapshot is not None else None
+            if record is not None:
+                yield sse_event(public_event(record), event="status")
+                if call_sid and record["status"] in TERMINAL_STATUSES:
+                    return
+            while True:
+                event = await subscription.next(timeout=SSE_HEARTBEAT_INTERVAL)
+                if event is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                yield sse_event(public_event(event), event="status")
+                if call_sid and event["status"] in TERMINAL_STATUSES:
+                    break
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(), media_type="text/event-stream", headers=SSE_HEADERS
+    )
@@ -0,0 +1,642 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# Which backend stores call records: "sqlite" (default) or "memory"
+CALL_STORE_BACKEND = os.getenv("CALL_STORE_BACKEND", "sqlite")
+CALL_STORE_PATH = os.getenv("CALL_STORE_PATH", "/tmp/answering-machine/calls.db")
+# Writes are buffered and committed together at most this often
+CALL_STORE_FLUSH_INTERVAL = float(os.getenv("CALL_STORE_FLUSH_INTERVAL", "0.05"))
+CALL_STORE_BATCH_SIZE = int(os.getenv("CALL_STORE_BATCH_SIZE", "200"))
+# Upper bound on the retry interval while commits keep failing
+CALL_STORE_MAX_FLUSH_BACKOFF = float(os.getenv("CALL_STORE_MAX_FLUSH_BACKOFF", "5"))
+# Records older than this are deleted, and the file compacted, periodically
+CALL_RETENTION_DAYS = float(os.getenv("CALL_RETENTION_DAYS", "30"))
+# Status events are only kept long enough for every worker to relay them
+CALL_EVENTS_RETENTION_SECONDS = float(os.getenv("CALL_EVENTS_RETENTION_SECONDS", "3600"))
+CALL_COMPACTION_INTERVAL = float(os.getenv("CALL_COMPACTION_INTERVAL", "3600"))
+
+CALL_FIELDS = [
+    "call_sid",
+    "to_phone_number",
+    "audio_file_url",
+    "status",
+    "created_at",
+    "updated_at",
+    "duration",
+    "price",
+    "error_message",
+]
+
+
+def new_call_record(call_sid: str, to_phone_number: str, audio_file_url: str) -> dict:
+    now = datetime.now().isoformat()
+    return {
+        "call_sid": call_sid,
+        "to_phone_number": to_phone_number,
+        "audio_file_url": audio_file_url,
+        "status": "queued",  # Initial status
+        "created_at": now,
+        "updated_at": now,
+        "duration": None,
+        "price": None,
+        "error_message": None,
+    }
+
+
+def encode_cursor(record: dict) -> str:
+    """Opaque pagination cursor pointing just after ``record``."""
+    position = json.dumps([record["created_at"] or "", record["call_sid"]])
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor."""
+    try:
+        created_at, call_sid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # Cursors issued for records without a creation time sort first
+    return created_at or "", call_sid
+
+
+class CallStore:
+    """Interface for call record storage backends.
+
+    Besides call records, the store holds small JSON documents (``put_state``)
+    and, when ``shared`` is true, a log of applied status events, so that
+    state is visible to every worker process.
+    """
+
+    shared = False
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def create(self, record: dict):
+        """Insert a call, or fill in the blanks of an existing one.
+
+        An existing record keeps its status, its creation time (unless it is
+        a stub created by a status callback) and any values already set.
+        """
+        raise NotImplementedError
+
+    async def update(self, call_sid: str, changes: dict):
+        raise NotImplementedError
+
+    async def update_status(self, call_sid: str, changes: dict, rank: int, sequence: int):
+        """Apply a status change only if ``(rank, sequence)`` moves the call forward."""
+        raise NotImplementedError
+
+    async def flush(self):
+        """Make buffered writes durable and visible to other workers."""
+
+    async def get(self, call_sid: str):
+        raise NotImplementedError
+
+    async def list(
+        self,
+        status=None,
+        to_phone_number=None,
+        since=None,
+        until=None,
+        after=None,
+        limit=None,
+        fields=None,
+    ):
+        """Records ordered by (created_at, call_sid).
+
+        ``after`` is a decoded cursor, ``since``/``until`` bound created_at
+        (inclusive/exclusive) and ``fields`` restricts the returned columns.
+        """
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    async def put_state(self, kind: str, key: str, value: dict):
+        raise NotImplementedError
+
+    async def get_state(self, kind: str, key: str):
+        raise NotImplementedError
+
+    async def take_token(self, name: str, rate: float, capacity: float) -> float:
+        """Take one token from the shared token bucket ``name``.
+
+        Returns 0 if a token was taken, otherwise how many seconds to wait
+        before trying again.
+        """
+        raise NotImplementedError
+
+    async def read_events(self, after_id: int, limit=500):
+        """Status events committed after ``after_id``, as ``(id, event)`` pairs."""
+        return []
+
+    async def last_event_id(self) -> int:
+        return 0
+
+
+class MemoryCallStore(CallStore):
+    """Process-local dict store; only suitable for a single worker."""
+
+    def __init__(self):
+        self.calls = {}
+        self.status_order = {}
+        self.state = {}
+
+    async def create(self, record: dict):
+        # Merged into an existing row the same way as the SQLite upsert
+        existing = self.calls.get(record["call_sid"])
+        if existing is None:
+            self.calls[record["call_sid"]] = dict(record)
+            return
+        if existing["to_phone_number"] is None or (
+            existing["audio_file_url"] is None and record["audio_file_url"] is not None
+        ):
+            existing["updated_at"] = record["updated_at"]
+        if existing["to_phone_number"] is None:
+            existing["created_at"] = record["created_at"]
+        for field in ("to_phone_number", "audio_file_url"):
+            if existing[field] is None:
+                existing[field] = record[field]
+
+    async def update(self, call_sid: str, changes: dict):
+        if call_sid not in self.calls:
+            # Stubbed like the SQLite upsert, so pagination can order it
+            self.calls[call_sid] = {field: None for field in CALL_FIELDS}
+            self.calls[call_sid]["call_sid"] = call_sid
+            self.calls[call_sid]["created_at"] = (
+                changes.get("updated_at") or datetime.now().isoformat()
+            )
+        self.calls[call_sid].update(changes)
+
+    async def update_status(self, call_sid: str, changes: dict, rank: int, sequence: int):
+        if (rank, sequence) > self.status_order.get(call_sid, (-1, -1)):
+            self.status_order[call_sid] = (rank, sequence)
+            await self.update(call_sid, changes)
+
+    async def get(self, call_sid: str):
+        record = self.calls.get(call_sid)
+        return dict(record) if record else None
+
+    async def list(
+        self,
+        status=None,
+        to_phone_number=None,
+        since=None,
+        until=None,
+        after=None,
+        limit=None,
+        fields=None,
+    ):
+        records = [
+            record
+            for record in self.calls.values()
+            if (status is None or record["status"] == status)
+            and (to_phone_number is None or record["to_phone_number"] == to_phone_number)
+            and (since is None or (record["created_at"] or "") >= since)
+            and (until is None or (record["created_at"] or "") < until)
+            and (
+                after is None
+                or ((record["created_at"] or ""), record["call_sid"])
+                > (after[0] or "", after[1])
+            )
+        ]
+        records.sort(key=lambda record: (record["created_at"] or "", record["call_sid"]))
+        if limit is not None:
+            records = records[:limit]
+        return [
+            {field: record.get(field) for field in fields or CALL_FIELDS}
+            for record in records
+        ]
+
+    async def count(self) -> int:
+        return len(self.calls)
+
+    async def put_state(self, kind: str, key: str, value: dict):
+        self.state[(kind, key)] = value
+
+    async def get_state(self, kind: str, key: str):
+        return self.state.get((kind, key))
+
+
+class SQLiteCallStore(CallStore):
+    """Call records in an embedded SQLite database (WAL mode).
+
+    Every worker opens its own connection to the same file, so records are
+    shared across uvicorn workers and survive restarts. Writes are buffered
+    and committed in batches by a background task; reads flush pending
+    writes first so a worker always sees its own updates.
+    """
+
+    shared = True
+
+    def __init__(self, path=CALL_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = []
+        self._flush_lock = None
+        self._flush_task = None
+        self._compaction_task = None
+        self._wakeup = None
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS calls (
+                call_sid TEXT PRIMARY KEY,
+                to_phone_number TEXT,
+                audio_file_url TEXT,
+                status TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                duration TEXT,
+                price TEXT,
+                error_message TEXT,
+                status_rank INTEGER,
+                sequence_number INTEGER
+            );
+            -- Keyset pagination walks (created_at, call_sid), optionally
+            -- within one status or phone number
+            DROP INDEX IF EXISTS idx_calls_status;
+            DROP INDEX IF EXISTS idx_calls_created_at;
+            CREATE INDEX IF NOT EXISTS idx_calls_created
+                ON calls (created_at, call_sid);
+            CREATE INDEX IF NOT EXISTS idx_calls_status_created
+                ON calls (status, created_at, call_sid);
+            CREATE INDEX IF NOT EXISTS idx_calls_phone_created
+                ON calls (to_phone_number, created_at, call_sid);
+
+            CREATE TABLE IF NOT EXISTS call_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+
+            -- Token buckets shared by every worker (e.g. the Twilio call rate)
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+
+            -- Pipeline jobs, campaigns and other small shared documents
+            CREATE TABLE IF NOT EXISTS shared_state (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (kind, key)
+            );
+            """
+        )
+        # Databases created before status precedence was tracked
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(calls)")}
+        for column in ("status_rank", "sequence_number"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE calls ADD COLUMN {column} INTEGER")
+        conn.commit()
+        return conn
+
+    def _execute(self, fn, *args):
+        with self._lock:
+            return fn(self._conn, *args)
+
+    async def start(self):
+        self._conn = await asyncio.to_thread(self._connect)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self._compaction_task = asyncio.create_task(self._compaction_loop())
+
+    async def stop(self):
+        for task in (self._flush_task, self._compaction_task):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(
+            *(t for t in (self._flush_task, self._compaction_task) if t),
+            return_exceptions=True,
+        )
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Lost {len(self._pending)} call store writes on shutdown: {e}")
+        if self._conn is not None:
+            await asyncio.to_thread(self._conn.close)
+            self._conn = None
+
+    # Writes
+
+    def _queue(self, op):
+        self._pending.append(op)
+        if len(self._pending) >= CALL_STORE_BATCH_SIZE and self._wakeup:
+            self._wakeup.set()
+
+    async def create(self, record: dict):
+        self._queue(("create", record))
+
+    async def update(self, call_sid: str, changes: dict):
+        self._queue(("update", call_sid, changes))
+
+    async def update_status(self, call_sid: str, changes: dict, rank: int, sequence: int):
+        self._queue(("status", call_sid, changes, rank, sequence))
+
+    async def put_state(self, kind: str, key: str, value: dict):
+        self._queue(("state", kind, key, json.dumps(value)))
+
+    @staticmethod
+    def _apply_batch(conn, ops):
+        with conn:
+            for op in ops:
+                if op[0] == "create":
+                    record = op[1]
+                    # A status callback handled by another worker may already
+                    # have created a stub row; keep its status and fill in
+                    # the rest. An existing full record keeps its creation
+                    # time and any values already set.
+                    conn.execute(
+                        f"""
+                        INSERT INTO calls ({", ".join(CALL_FIELDS)}, status_rank, sequence_number)
+                        VALUES ({", ".join("?" for _ in CALL_FIELDS)}, 0, -1)
+                        ON CONFLICT(call_sid) DO UPDATE SET
+                            created_at = CASE WHEN calls.to_phone_number IS NULL
+                                THEN excluded.created_at ELSE calls.created_at END,
+                            updated_at = CASE WHEN calls.to_phone_number IS NULL
+                                OR (calls.audio_file_url IS NULL
+                                    AND excluded.audio_file_url IS NOT NULL)
+                                THEN excluded.updated_at ELSE calls.updated_at END,
+                            to_phone_number = COALESCE(
+                                calls.to_phone_number, excluded.to_phone_number),
+                            audio_file_url = COALESCE(
+                                calls.audio_file_url, excluded.audio_file_url)
+                        """,
+                        [record.get(field) for field in CALL_FIELDS],
+                    )
+                elif op[0] == "status":
+                    _, call_sid, changes, rank, sequence = op
+                    columns = [field for field in changes if field in CALL_FIELDS]
+                    # Duplicates and stale (out-of-order) callbacks are no-ops
+                    applied = conn.execute(
+                        f"""
+                        INSERT INTO calls (call_sid, created_at, status_rank,
+                            sequence_number, {", ".join(columns)})
+                        VALUES (?, ?, ?, ?, {", ".join("?" for _ in columns)})
+                        ON CONFLICT(call_sid) DO UPDATE SET
+                            {", ".join(f"{c} = excluded.{c}" for c in columns)},
+                            status_rank = excluded.status_rank,
+                            sequence_number = excluded.sequence_number
+                        WHERE excluded.status_rank > COALESCE(calls.status_rank, -1)
+                            OR (excluded.status_rank = COALESCE(calls.status_rank, -1)
+                                AND excluded.sequence_number
+                                    > COALESCE(calls.sequence_number, -1))
+                        """,
+                        [call_sid, changes.get("updated_at"), rank, sequence]
+                        + [changes[c] for c in columns],
+                    ).rowcount
+                    if applied:
+                        # Logged for the other workers' SSE subscribers
+                        event = {
+                            "call_sid": call_sid,
+                            "rank": rank,
+                            "sequence": sequence,
+                            **changes,
+                        }
+                        conn.execute(
+                            "INSERT INTO call_events (event, created_at) VALUES (?, ?)",
+                            (json.dumps(event), datetime.now().isoformat()),
+                        )
+                elif op[0] == "state":
+                    _, kind, key, value = op
+                    conn.execute(
+                        "INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?, ?)",
+                        (kind, key, value, datetime.now().isoformat()),
+                    )
+                else:
+                    _, call_sid, changes = op
+                    columns = [field for field in changes if field in CALL_FIELDS]
+                    conn.execute(
+                        f"""
+                        INSERT INTO calls (call_sid, created_at, {", ".join(columns)})
+                        VALUES (?, ?, {", ".join("?" for _ in columns)})
+                        ON CONFLICT(call_sid) DO UPDATE SET
+                            {", ".join(f"{c} = excluded.{c}" for c in columns)}
+                        """,
+                        [call_sid, changes.get("updated_at")]
+                        + [changes[c] for c in columns],
+                    )
+
+    async def flush(self):
+        """Commit all buffered writes in one transaction.
+
+        A batch that fails to commit is put back ahead of newer writes and
+        retried on the next flush.
+        """
+        if self._conn is None:
+            return
+        # Batches must be applied in the order they were queued. The lock is
+        # taken before checking for pending writes so that a read also waits
+        # for a batch another task is still committing.
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            ops, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._execute, self._apply_batch, ops)
+            except Exception:
+                self._pending[:0] = ops
+                raise
+
+    async def _flush_loop(self):
+        failures = 0
+        while True:
+            # Back off while the database keeps failing (e.g. locked)
+            interval = min(
+                CALL_STORE_FLUSH_INTERVAL * 2**failures, CALL_STORE_MAX_FLUSH_BACKOFF
+            )
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                failures = min(failures + 1, 16)
+                print(
+                    f"Failed to flush {len(self._pending)} call store writes, "
+                    f"will retry: {e}"
+                )
+
+    @staticmethod
+    def _take_token(conn, name, rate, capacity):
+        # BEGIN IMMEDIATE holds the write lock across the read and update, so
+        # workers can't both take the last token
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limits WHERE name = ?", (name,)
+            ).fetchone()
+            tokens = capacity
+            if row is not None:
+                tokens = min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?)",
+                (name, tokens, now),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return wait
+
+    async def take_token(self, name: str, rate: float, capacity: float) -> float:
+        return await asyncio.to_thread(
+            self._execute, self._take_token, name, rate, capacity
+        )
+
+    # Reads
+
+    async def get(self, call_sid: str):
+        await self.flush()
+        row = await asyncio.to_thread(
+            self._execute,
+            lambda conn: conn.execute(
+                f"SELECT {', '.join(CALL_FIELDS)} FROM calls WHERE call_sid = ?",
+                (call_sid,),
+            ).fetchone(),
+        )
+        return dict(row) if row else None
+
+    async def list(
+        self,
+        status=None,
+        to_phone_number=None,
+        since=None,
+        until=None,
+        after=None,
+        limit=None,
+        fields=None,
+    ):
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if to_phone_number is not None:
+            clauses.append("to_phone_number = ?")
+            params.append(to_phone_number)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if after is not None:
+            clauses.append("(created_at > ? OR (created_at = ? AND call_sid > ?))")
+            params.extend([after[0] or "", after[0] or "", after[1]])
+        columns = [field for field in CALL_FIELDS if field in (fields or CALL_FIELDS)]
+        query = f"SELECT {', '.join(columns)} FROM calls"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at, call_sid"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        await self.flush()
+        rows = await asyncio.to_thread(
+            self._execute, lambda conn: conn.execute(query, params).fetchall()
+        )
+        return [dict(row) for row in rows]
+
+    async def count(self) -> int:
+        await self.flush()
+        row = await asyncio.to_thread(
+            self._execute,
+            lambda conn: conn.execute("SELECT COUNT(*) FROM calls").fetchone(),
+        )
+        return row[0]
+
+    async def get_state(self, kind: str, key: str):
+        await self.flush()
+        row = await asyncio.to_thread(
+            self._execute,
+            lambda conn: conn.execute(
+                "SELECT value FROM shared_state WHERE kind = ? AND key = ?",
+                (kind, key),
+            ).fetchone(),
+        )
+        return json.loads(row[0]) if row else None
+
+    async def read_events(self, after_id: int, limit=500):
+        rows = await asyncio.to_thread(
+            self._execute,
+            lambda conn: conn.execute(
+                "SELECT id, event FROM call_events WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall(),
+        )
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    async def last_event_id(self) -> int:
+        row = await asyncio.to_thread(
+            self._execute,
+            lambda conn: conn.execute("SELECT MAX(id) FROM call_events").fetchone(),
+        )
+        return row[0] or 0
+
+    # Retention
+
+    @staticmethod
+    def _compact(conn, cutoff):
+        events_cutoff = (
+            datetime.now() - timedelta(seconds=CALL_EVENTS_RETENTION_SECONDS)
+        ).isoformat()
+        with conn:
+            deleted = conn.execute(
+                "DELETE FROM calls WHERE created_at < ?", (cutoff,)
+            ).rowcount
+            conn.execute("DELETE FROM call_events WHERE created_at < ?", (events_cutoff,))
+            conn.execute("DELETE FROM shared_state WHERE updated_at < ?", (cutoff,))
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    async def _compaction_loop(self):
+        while True:
+            cutoff = (datetime.now() - timedelta(days=CALL_RETENTION_DAYS)).isoformat()
+            try:
+                deleted = await asyncio.to_thread(self._execute, self._compact, cutoff)
+                if deleted:
+                    print(f"🧹 Removed {deleted} call records older than {cutoff}")
+            except Exception as e:
+                print(f"Call record compaction failed: {e}")
+            await asyncio.sleep(CALL_COMPACTION_INTERVAL)
+
+
+def create_call_store() -> CallStore:
+    """Build the call store selected by CALL_STORE_BACKEND."""
+    if CALL_STORE_BACKEND == "memory":
+        return MemoryCallStore()
+    return SQLiteCallStore()
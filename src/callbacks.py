@@ -0,0 +1,184 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+
+# Callback events applied per store transaction, and queue bound before the
+# webhook starts waiting (backpressure) instead of acknowledging immediately
+CALLBACK_BATCH_SIZE = int(os.getenv("CALLBACK_BATCH_SIZE", "500"))
+CALLBACK_QUEUE_SIZE = int(os.getenv("CALLBACK_QUEUE_SIZE", "10000"))
+
+# Twilio call statuses in lifecycle order; terminal statuses share the top
+# rank so a late "ringing" can never overwrite "completed"
+STATUS_RANK = {
+    "queued": 0,
+    "initiated": 1,
+    "ringing": 2,
+    "in-progress": 3,
+    "completed": 4,
+    "busy": 4,
+    "failed": 4,
+    "no-answer": 4,
+    "canceled": 4,
+}
+
+
+TERMINAL_STATUSES = {
+    status for status, rank in STATUS_RANK.items() if rank == STATUS_RANK["completed"]
+}
+
+
+def status_rank(status: str) -> int:
+    return STATUS_RANK.get(status, 0)
+
+
+def parse_sequence_number(value) -> int:
+    """Twilio's SequenceNumber, or -1 when missing or malformed."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+class CallbackIngestor:
+    """Queues Twilio status callbacks and applies them to the call store in batches.
+
+    Webhooks return as soon as the event is queued. A single background task
+    drains the queue, keeps only the most advanced event per call in each
+    batch, and writes them with a precedence check so duplicated or
+    out-of-order callbacks are harmless. ``on_applied(event)`` is called for
+    each event once it has been committed.
+    """
+
+    def __init__(self, call_store, on_applied=None):
+        self.call_store = call_store
+        self.on_applied = on_applied
+        self._queue = None
+        self._task = None
+        self.received = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.max_queue_depth = 0
+        self.last_batch_size = 0
+        self.apply_seconds_total = 0.0
+        self.apply_seconds_max = 0.0
+        self.event_lag_seconds_max = 0.0
+
+    def _ensure_started(self):
+        # Created lazily so the queue belongs to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=CALLBACK_QUEUE_SIZE)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(
+        self, call_sid, status, duration, price, error_message, sequence_number=None
+    ):
+        """Queue one status callback."""
+        self._ensure_started()
+        await self._queue.put(
+            {
+                "call_sid": call_sid,
+                "status": status,
+                "duration": duration,
+                "price": price,
+                "error_message": error_message,
+                "rank": status_rank(status),
+                "sequence": parse_sequence_number(sequence_number),
+                "updated_at": datetime.now().isoformat(),
+                "received": time.monotonic(),
+            }
+        )
+        self.received += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    async def _run(self):
+        while True:
+            event = await self._queue.get()
+            batch = [event]
+            while event is not None and len(batch) < CALLBACK_BATCH_SIZE:
+                try:
+                    event = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                batch.append(event)
+            stopping = batch[-1] is None
+            events = [event for event in batch if event is not None]
+            if events:
+                try:
+                    await self._apply(events)
+                except Exception as e:
+                    self.failed_batches += 1
+                    print(f"Failed to apply {len(events)} call status callbacks: {e}")
+            if stopping:
+                return
+
+    async def _apply(self, events):
+        started = time.perf_counter()
+        latest = {}
+        for event in events:
+            current = latest.get(event["call_sid"])
+            if current is None or (event["rank"], event["sequence"]) > (
+                current["rank"],
+                current["sequence"],
+            ):
+                latest[event["call_sid"]] = event
+        for event in latest.values():
+            await self.call_store.update_status(
+                event["call_sid"],
+                {
+                    "status": event["status"],
+                    "updated_at": event["updated_at"],
+                    "duration": event["duration"],
+                    "price": event["price"],
+                    "error_message": event["error_message"],
+                },
+                event["rank"],
+                event["sequence"],
+            )
+        await self.call_store.flush()
+        if self.on_applied is not None:
+            for event in latest.values():
+                self.on_applied(event)
+
+        elapsed = time.perf_counter() - started
+        now = time.monotonic()
+        self.batches += 1
+        self.applied += len(latest)
+        self.coalesced += len(events) - len(latest)
+        self.last_batch_size = len(events)
+        self.apply_seconds_total += elapsed
+        self.apply_seconds_max = max(self.apply_seconds_max, elapsed)
+        self.event_lag_seconds_max = max(
+            self.event_lag_seconds_max,
+            max(now - event["received"] for event in events),
+        )
+
+    async def stop(self):
+        """Apply everything already queued, then stop the background task."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "received": self.received,
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "last_batch_size": self.last_batch_size,
+            "apply_ms_avg": (
+                round(self.apply_seconds_total / self.batches * 1000, 2)
+                if self.batches
+                else None
+            ),
+            "apply_ms_max": round(self.apply_seconds_max * 1000, 2),
+            "event_lag_ms_max": round(self.event_lag_seconds_max * 1000, 2),
+        }
@@ -0,0 +1,229 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+
+# Outbound call rate allowed by our Twilio account, and dispatcher sizing
+TWILIO_CALLS_PER_SECOND = float(os.getenv("TWILIO_CALLS_PER_SECOND", "1"))
+CAMPAIGN_CONCURRENCY = int(os.getenv("CAMPAIGN_CONCURRENCY", "10"))
+CAMPAIGN_MAX_RETRIES = int(os.getenv("CAMPAIGN_MAX_RETRIES", "5"))
+CAMPAIGN_BACKOFF_SECONDS = float(os.getenv("CAMPAIGN_BACKOFF_SECONDS", "1"))
+CAMPAIGN_MAX_CAMPAIGNS = int(os.getenv("CAMPAIGN_MAX_CAMPAIGNS", "100"))
+# Progress is published via on_update at most this often per campaign
+CAMPAIGN_SAVE_INTERVAL = float(os.getenv("CAMPAIGN_SAVE_INTERVAL", "1"))
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursting to ``capacity``."""
+
+    def __init__(self, rate, capacity=1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    """Token bucket kept in a shared call store.
+
+    Every worker draws from the same bucket, so the account-wide rate holds
+    however many workers are dispatching campaigns.
+    """
+
+    def __init__(self, store, name, rate, capacity=1.0):
+        self.store = store
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # One request at a time per worker; the store arbitrates between workers
+        async with self._lock:
+            while True:
+                wait = await self.store.take_token(self.name, self.rate, self.capacity)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+
+def is_retryable(result: dict) -> bool:
+    """Throttling (429) and Twilio server errors are worth retrying."""
+    status_code = result.get("status_code")
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+class CampaignDispatcher:
+    """Background dispatcher that places queued campaign calls.
+
+    A fixed pool of workers bounds concurrency, a token bucket keeps us
+    within the account's calls-per-second allowance, and throttled calls are
+    retried with exponential backoff. Pass a SharedTokenBucket as ``bucket``
+    when several workers dispatch campaigns. ``on_update(campaign)`` is
+    awaited as the campaign progresses (throttled) and when it completes.
+    """
+
+    def __init__(
+        self,
+        place_call,
+        on_call_placed=None,
+        on_update=None,
+        rate=TWILIO_CALLS_PER_SECOND,
+        concurrency=CAMPAIGN_CONCURRENCY,
+        bucket=None,
+    ):
+        self.place_call = place_call
+        self.on_call_placed = on_call_placed
+        self.on_update = on_update
+        self.concurrency = concurrency
+        self.bucket = bucket or TokenBucket(rate)
+        self.campaigns = OrderedDict()
+        self._saved_at = {}
+        self._queue = None
+        self._workers = []
+
+    def _ensure_started(self):
+        # Created lazily so the queue belongs to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [
+                asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+            ]
+
+    async def submit(self, calls):
+        """Queue a list of ``(to_phone_number, audio_file_url)`` pairs."""
+        self._ensure_started()
+        campaign = {
+            "campaign_id": uuid.uuid4().hex,
+            "status": "running",
+            "total": len(calls),
+            "queued": len(calls),
+            "placed": 0,
+            "failed": 0,
+            "retries": 0,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None,
+            "calls": [
+                {
+                    "to_phone_number": to_phone_number,
+                    "audio_file_url": audio_file_url,
+                    "status": "queued",
+                    "call_sid": None,
+                    "attempts": 0,
+                    "error": None,
+                }
+                for to_phone_number, audio_file_url in calls
+            ],
+        }
+        self.campaigns[campaign["campaign_id"]] = campaign
+        self._forget_old_campaigns()
+        for call in campaign["calls"]:
+            self._queue.put_nowait((campaign, call))
+        if not calls:
+            self._finish(campaign)
+        await self._save(campaign, force=True)
+        return campaign
+
+    def get(self, campaign_id):
+        return self.campaigns.get(campaign_id)
+
+    def _forget_old_campaigns(self):
+        finished = [
+            campaign_id
+            for campaign_id, campaign in self.campaigns.items()
+            if campaign["status"] == "completed"
+        ]
+        for campaign_id in finished[: max(0, len(self.campaigns) - CAMPAIGN_MAX_CAMPAIGNS)]:
+            del self.campaigns[campaign_id]
+            self._saved_at.pop(campaign_id, None)
+
+    async def _save(self, campaign, force=False):
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        last = self._saved_at.get(campaign["campaign_id"])
+        if force or last is None or now - last >= CAMPAIGN_SAVE_INTERVAL:
+            self._saved_at[campaign["campaign_id"]] = now
+            try:
+                await self.on_update(campaign)
+            except Exception as e:
+                print(f"Failed to save campaign {campaign['campaign_id']}: {e}")
+
+    def _finish(self, campaign):
+        campaign["status"] = "completed"
+        campaign["completed_at"] = datetime.now().isoformat()
+        print(
+            f"📣 Campaign {campaign['campaign_id']} complete: "
+            f"{campaign['placed']} placed, {campaign['failed']} failed"
+        )
+
+    async def _worker(self):
+        while True:
+            campaign, call = await self._queue.get()
+            try:
+                await self._dispatch(campaign, call)
+            except Exception as e:
+                call["status"] = "failed"
+                call["error"] = str(e)
+                campaign["failed"] += 1
+            finally:
+                campaign["queued"] -= 1
+                if campaign["queued"] == 0:
+                    self._finish(campaign)
+                await self._save(campaign, force=campaign["queued"] == 0)
+                self._queue.task_done()
+
+    async def _dispatch(self, campaign, call):
+        for attempt in range(CAMPAIGN_MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            call["attempts"] += 1
+            result = await self.place_call(
+                call["to_phone_number"], call["audio_file_url"]
+            )
+            if result.get("success"):
+                call["status"] = "placed"
+                call["call_sid"] = result["call_sid"]
+                campaign["placed"] += 1
+                if self.on_call_placed is not None:
+                    await self.on_call_placed(
+                        result["call_sid"],
+                        call["to_phone_number"],
+                        call["audio_file_url"],
+                    )
+                return
+            call["error"] = result.get("error")
+            if not is_retryable(result) or attempt == CAMPAIGN_MAX_RETRIES:
+                break
+            campaign["retries"] += 1
+            backoff = CAMPAIGN_BACKOFF_SECONDS * 2**attempt
+            await asyncio.sleep(backoff + random.uniform(0, backoff / 2))
+        call["status"] = "failed"
+        campaign["failed"] += 1
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
@@ -0,0 +1,82 @@
+import os
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Uploads at or above this size use resumable, chunked uploads
+GCS_RESUMABLE_THRESHOLD = int(os.getenv("GCS_RESUMABLE_THRESHOLD", str(8 * 1024 * 1024)))
+# Resumable chunk size; must be a multiple of 256 KiB
+GCS_CHUNK_SIZE = int(os.getenv("GCS_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Uploads at or above this size are split into parts uploaded in parallel
+GCS_COMPOSITE_THRESHOLD = int(
+    os.getenv("GCS_COMPOSITE_THRESHOLD", str(64 * 1024 * 1024))
+)
+GCS_COMPOSITE_PART_SIZE = int(
+    os.getenv("GCS_COMPOSITE_PART_SIZE", str(32 * 1024 * 1024))
+)
+GCS_COMPOSITE_PARALLELISM = int(os.getenv("GCS_COMPOSITE_PARALLELISM", "4"))
+
+# GCS compose accepts at most this many source objects
+MAX_COMPOSE_SOURCES = 32
+
+
+def upload_composite(bucket, blob, file_obj, size, content_type):
+    """Upload a large file as parallel parts, then compose them into ``blob``.
+
+    Parts are read sequentially and uploaded by a small thread pool; at most
+    ``GCS_COMPOSITE_PARALLELISM`` parts are held in memory at once.
+    """
+    part_size = max(GCS_COMPOSITE_PART_SIZE, math.ceil(size / MAX_COMPOSE_SOURCES))
+    slots = threading.BoundedSemaphore(GCS_COMPOSITE_PARALLELISM)
+    parts = []
+    futures = []
+
+    def upload_part(part, data):
+        try:
+            part.upload_from_string(data, content_type=content_type)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=GCS_COMPOSITE_PARALLELISM) as pool:
+        try:
+            while True:
+                slots.acquire()
+                data = file_obj.read(part_size)
+                if not data:
+                    slots.release()
+                    break
+                part = bucket.blob(f"{blob.name}.parts/{len(parts):02d}")
+                parts.append(part)
+                futures.append(pool.submit(upload_part, part, data))
+            for future in futures:
+                future.result()
+
+            blob.content_type = content_type
+            blob.compose(parts)
+        finally:
+            # Parts are only scratch space; clean them up whether or not the
+            # compose succeeded (delete failures are ignored)
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            for part in parts:
+                pool.submit(part.delete)
+
+
+def upload_stream(bucket, object_name, file_obj, size, content_type):
+    """Upload a file object to GCS without buffering it all in memory.
+
+    Small files go up in a single request, larger ones as a resumable upload
+    in ``GCS_CHUNK_SIZE`` chunks, and very large ones as parallel composite
+    parts. Returns the blob and the upload mode used.
+    """
+    blob = bucket.blob(object_name)
+    if size >= GCS_COMPOSITE_THRESHOLD:
+        upload_composite(bucket, blob, file_obj, size, content_type)
+        return blob, "composite"
+    if size >= GCS_RESUMABLE_THRESHOLD:
+        blob.chunk_size = GCS_CHUNK_SIZE
+        blob.upload_from_file(file_obj, content_type=content_type, size=size)
+        return blob, "resumable"
+    blob.upload_from_file(file_obj, content_type=content_type, size=size)
+    return blob, "simple"
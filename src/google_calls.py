@@ -1,12 +1,16 @@
 import os
 import json
+import base64
 import asyncio
-import uuid
-import wave
 import io
+import hashlib
+import re
+import time
+import httpx
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from fastapi import UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from google import genai
 from google.genai import types
 
@@ -15,6 +19,21 @@ from google.oauth2 import service_account
 from google.cloud import storage
 import google.auth.transport.requests
 
+from audio_formats import (
+    FILE_EXTENSIONS,
+    OUTPUT_FORMATS,
+    encode_audio,
+    transcode_wav,
+    validate_output_format,
+    wav_stream_header,
+)
+from caching import SingleFlight, TTLCache, TTSCache, tts_cache_key
+from gcs_upload import upload_stream
+from json_stream import IncrementalJSONObject
+from metrics import STAGE_SECONDS, Counter, log_event, stage_timer
+from sse import SSE_HEADERS, SSE_HEARTBEAT_INTERVAL, sse_event
+from upload_index import UploadIndex, hash_file
+
 load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 service_account_key_json = os.getenv("SERVICE_ACCOUNT_KEY_JSON")
@@ -25,16 +44,130 @@ print(f"GEMINI_API_KEY present: {bool(gemini_api_key)}")
 print(f"SERVICE_ACCOUNT_KEY_JSON present: {bool(service_account_key_json)}")
 print(f"GCS_STORAGE_BUCKET present: {bool(gcs_storage_bucket)}")
 
+# Connection pool settings for the shared Gemini transport
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "60"))
+
+# Gemini TTS defaults
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+DEFAULT_TTS_VOICE = os.getenv("DEFAULT_TTS_VOICE", "Zephyr")
+
+# Long-form synthesis: segment size, parallelism and inter-segment silence
+TTS_SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", "600"))
+TTS_MAX_PARALLEL = int(os.getenv("TTS_MAX_PARALLEL", "4"))
+TTS_SEGMENT_PAUSE_MS = int(os.getenv("TTS_SEGMENT_PAUSE_MS", "150"))
+
+# Synthesized audio is cached by content so repeated scripts skip TTS
+tts_cache = TTSCache()
+
+# Refresh the Google access token this many seconds before it expires
+CREDENTIAL_REFRESH_MARGIN = int(os.getenv("CREDENTIAL_REFRESH_MARGIN", "300"))
+
+# Signed URLs are valid this long, and are reused while at least
+# SIGNED_URL_MIN_REMAINING seconds of that lifetime are left
+SIGNED_URL_TTL = int(os.getenv("SIGNED_URL_TTL", "3600"))
+SIGNED_URL_MIN_REMAINING = int(os.getenv("SIGNED_URL_MIN_REMAINING", "600"))
+signed_url_cache = TTLCache(
+    max_items=int(os.getenv("SIGNED_URL_CACHE_SIZE", "1024")),
+    default_ttl=SIGNED_URL_TTL - SIGNED_URL_MIN_REMAINING,
+)
+
+# Opt-in cache of deterministic text/JSON responses, keyed on prompt, model
+# and generation config; concurrent identical requests share one upstream call
+GEMINI_RESPONSE_CACHE_TTL = float(os.getenv("GEMINI_RESPONSE_CACHE_TTL", "300"))
+gemini_response_cache = TTLCache(
+    max_items=int(os.getenv("GEMINI_RESPONSE_CACHE_SIZE", "1024")),
+    default_ttl=GEMINI_RESPONSE_CACHE_TTL,
+)
+gemini_response_flights = SingleFlight()
+GEMINI_RESPONSE_CACHE_RESULTS = Counter(
+    "gemini_response_cache_total",
+    "Cacheable Gemini requests by cache result",
+    ["kind", "result"],
+)
+
+# /flowcode_demo asks the model for JSON matching this schema (set
+# FLOWCODE_STRICT_SCHEMA=false to only require valid JSON), and retries
+# output that still fails to parse this many times
+FLOWCODE_MODEL = "gemini-2.0-flash"
+FLOWCODE_STRICT_SCHEMA = os.getenv("FLOWCODE_STRICT_SCHEMA", "true").lower() == "true"
+FLOWCODE_JSON_RETRIES = int(os.getenv("FLOWCODE_JSON_RETRIES", "1"))
+FLOWCODE_RESPONSE_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "sentimentAnalysis": types.Schema(type=types.Type.STRING),
+        "sentimentBrief": types.Schema(type=types.Type.STRING),
+        "category": types.Schema(type=types.Type.STRING),
+    },
+    required=["sentimentAnalysis", "sentimentBrief", "category"],
+    # Short fields first, so streamed classifications arrive early
+    property_ordering=["category", "sentimentAnalysis", "sentimentBrief"],
+)
+GEMINI_INVALID_JSON = Counter(
+    "gemini_invalid_json_total",
+    "Gemini replies that were not valid JSON, by whether they were retried",
+    ["endpoint", "outcome"],
+)
+
+# /gemini/batch: requests in flight per batch (by default and at most), batch
+# size limit, and how long a single item may take before it is reported failed
+GEMINI_BATCH_CONCURRENCY = int(os.getenv("GEMINI_BATCH_CONCURRENCY", "8"))
+GEMINI_BATCH_MAX_CONCURRENCY = int(os.getenv("GEMINI_BATCH_MAX_CONCURRENCY", "32"))
+GEMINI_BATCH_MAX_ITEMS = int(os.getenv("GEMINI_BATCH_MAX_ITEMS", "500"))
+GEMINI_BATCH_ITEM_TIMEOUT = float(os.getenv("GEMINI_BATCH_ITEM_TIMEOUT", "60"))
+
+# Process-wide Gemini client, created on app startup and closed on shutdown
+gemini_client = None
+gemini_http_client = None
+
+# Google Cloud credentials and storage handles, shared across requests
+google_credentials = None
+credentials_task = None
+storage_client = None
+storage_bucket = None
+upload_index = None
+
+
+def init_gemini_client():
+    """Create the shared Gemini client backed by a pooled keep-alive transport."""
+    global gemini_client, gemini_http_client
+    if gemini_client is not None or not gemini_api_key:
+        return gemini_client
+
+    gemini_http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+        ),
+    )
+    gemini_client = genai.Client(
+        api_key=gemini_api_key,
+        http_options=types.HttpOptions(httpx_async_client=gemini_http_client),
+    )
+    print("Gemini client initialized")
+    return gemini_client
+
 
-def create_wav_from_pcm(pcm_data, channels=1, rate=24000, sample_width=2):
-    """Create WAV file data from PCM data following Google's recommended approach."""
-    wav_buffer = io.BytesIO()
-    with wave.open(wav_buffer, "wb") as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(sample_width)
-        wf.setframerate(rate)
-        wf.writeframes(pcm_data)
-    return wav_buffer.getvalue()
+async def close_gemini_client():
+    """Close the shared Gemini client and its connection pool."""
+    global gemini_client, gemini_http_client
+    if gemini_client is not None:
+        await gemini_client.aio.aclose()
+        gemini_client = None
+    if gemini_http_client is not None:
+        await gemini_http_client.aclose()
+        gemini_http_client = None
+
+
+def get_gemini_client():
+    """Return the shared Gemini client, creating it on first use."""
+    if not gemini_api_key:
+        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
+    return init_gemini_client()
 
 
 def sanity_check(req: str):
@@ -45,16 +178,14 @@ def sanity_check(req: str):
     return True
 
 
-def get_google_credentials():
-    """Get Google Cloud credentials from the environment variable."""
+def load_google_credentials():
+    """Parse service-account credentials from the environment variable."""
     if not service_account_key_json:
         print("WARNING: SERVICE_ACCOUNT_KEY_JSON is not set.")
         return None
     try:
         # Try to decode from base64 first (recommended approach)
         try:
-            import base64
-
             decoded_json = base64.b64decode(service_account_key_json).decode("utf-8")
             service_account_info = json.loads(decoded_json)
             print("Using base64-decoded service account credentials.")
@@ -63,51 +194,23 @@ def get_google_credentials():
             service_account_info = json.loads(service_account_key_json)
             print("Using direct JSON service account credentials.")
 
-        # Debug: Check if private_key exists and its format
-        if "private_key" in service_account_info:
-            private_key = service_account_info["private_key"]
-            print(f"Private key length: {len(private_key)}")
-            print(f"Private key starts with: {private_key[:50]}...")
-
-            literal_newline = "\\n"
-            actual_newline = chr(10)
-            print(f"Contains literal \\n: {literal_newline in private_key}")
-            print(f"Contains actual newlines: {actual_newline in private_key}")
-
-            # Fix common issue: replace literal \n with actual newlines
-            if literal_newline in private_key and actual_newline not in private_key:
-                print("Fixing literal \\n characters in private key...")
-                service_account_info["private_key"] = private_key.replace(
-                    literal_newline, actual_newline
-                )
+        # Fix common issue: replace literal \n with actual newlines
+        private_key = service_account_info.get("private_key", "")
+        literal_newline = "\\n"
+        actual_newline = chr(10)
+        if literal_newline in private_key and actual_newline not in private_key:
+            service_account_info["private_key"] = private_key.replace(
+                literal_newline, actual_newline
+            )
 
         # Add Cloud Storage scopes
         credentials = service_account.Credentials.from_service_account_info(
             service_account_info,
             scopes=["https://www.googleapis.com/auth/cloud-platform"],
         )
-
-        # Debug service account info
-        print("Successfully created service account credentials.")
         print(
-            f"Service account email: {service_account_info.get('client_email', 'Not found')}"
+            f"Loaded service account credentials for {service_account_info.get('client_email', 'unknown')}"
         )
-        print(f"Project ID: {service_account_info.get('project_id', 'Not found')}")
-        print(
-            f"Private key ID: {service_account_info.get('private_key_id', 'Not found')[:10]}..."
-        )
-
-        # Test credentials by refreshing them
-        try:
-            print("Testing credential refresh...")
-            credentials.refresh(google.auth.transport.requests.Request())
-            print("✅ Credentials refreshed successfully - JWT signature is valid!")
-        except Exception as refresh_error:
-            print(f"❌ Credential refresh failed: {refresh_error}")
-            print(
-                f"This confirms the JWT signature issue is in the service account key itself."
-            )
-
         return credentials
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from SERVICE_ACCOUNT_KEY_JSON: {e}")
@@ -118,115 +221,462 @@ def get_google_credentials():
         return None
 
 
-def gemini_text_call(
+def get_google_credentials():
+    """Return the cached Google Cloud credentials, parsing them on first use."""
+    global google_credentials
+    if google_credentials is None:
+        google_credentials = load_google_credentials()
+    return google_credentials
+
+
+def seconds_until_refresh(credentials):
+    """Seconds until the access token should be refreshed (<= 0 means now)."""
+    if not credentials.token or credentials.expiry is None:
+        return 0
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (credentials.expiry - now).total_seconds() - CREDENTIAL_REFRESH_MARGIN
+
+
+async def credentials_refresh_loop():
+    """Refresh the access token ahead of expiry so requests never wait on it."""
+    while True:
+        credentials = get_google_credentials()
+        if credentials is None:
+            return
+        try:
+            if seconds_until_refresh(credentials) <= 0:
+                await asyncio.to_thread(
+                    credentials.refresh, google.auth.transport.requests.Request()
+                )
+                print(f"✅ Google credentials refreshed, expiry {credentials.expiry}")
+            delay = max(seconds_until_refresh(credentials), 30)
+        except Exception as e:
+            print(f"❌ Credential refresh failed: {e}")
+            delay = 60
+        await asyncio.sleep(delay)
+
+
+def init_storage():
+    """Create the shared storage client and validate bucket access once."""
+    global storage_client, storage_bucket
+    credentials = get_google_credentials()
+    if not credentials or not gcs_storage_bucket:
+        return None
+
+    client = storage.Client(credentials=credentials, project=credentials.project_id)
+    bucket = client.bucket(gcs_storage_bucket)
+    bucket.reload()  # This will fail if we don't have access
+    print(f"Bucket {gcs_storage_bucket} ready (location: {bucket.location})")
+
+    storage_client, storage_bucket = client, bucket
+    return storage_bucket
+
+
+def get_storage_bucket():
+    """Return the shared bucket handle, validating it on first use."""
+    if storage_bucket is not None:
+        return storage_bucket
+    if not get_google_credentials():
+        raise HTTPException(
+            status_code=500, detail="Google Cloud credentials not configured"
+        )
+    if not gcs_storage_bucket:
+        raise HTTPException(status_code=500, detail="GCS_STORAGE_BUCKET not configured")
+    return init_storage()
+
+
+async def start_google_services():
+    """Warm up shared Google clients when the app starts."""
+    global credentials_task
+    init_gemini_client()
+    if get_google_credentials() and gcs_storage_bucket:
+        try:
+            await asyncio.to_thread(init_storage)
+        except Exception as e:
+            print(f"Failed to access bucket {gcs_storage_bucket}: {e}")
+        credentials_task = asyncio.create_task(credentials_refresh_loop())
+
+
+async def warm_gemini_client():
+    """Open a pooled connection to the Gemini API before traffic arrives."""
+    client = init_gemini_client()
+    if client is None:
+        return
+    try:
+        await client.aio.models.get(model="gemini-2.0-flash")
+        print("Gemini connection warmed")
+    except Exception as e:
+        print(f"Gemini warm-up failed: {e}")
+
+
+async def stop_google_services():
+    """Stop background tasks and close shared Google clients."""
+    global credentials_task
+    if credentials_task is not None:
+        credentials_task.cancel()
+        credentials_task = None
+    await close_gemini_client()
+
+
+async def gemini_text_call(
     prompt=None,
     model=None,
     return_type=None,
 ):
-    if not gemini_api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
-
-    client = genai.Client(api_key=gemini_api_key)
+    client = get_gemini_client()
     if not model:
         model = "gemini-2.0-flash"
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[f"{prompt}"],
-    )
-    print(response.text)
+    with stage_timer("gemini_text"):
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=[f"{prompt}"],
+        )
+    log_event("gemini_text", model=model, chars=len(response.text or ""))
     return response
 
 
-def flowcode_demo_gemini_call(prompt: str):
-    if not gemini_api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
-    client = genai.Client(api_key=gemini_api_key)
+def flowcode_config():
+    """Generation config that constrains flowcode_demo output to JSON."""
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=FLOWCODE_RESPONSE_SCHEMA if FLOWCODE_STRICT_SCHEMA else None,
+    )
 
-    # Enhanced prompt to ensure clean JSON output
-    enhanced_prompt = f"""
-{prompt}
 
-IMPORTANT: Respond with ONLY valid JSON. Do not include any markdown formatting, code blocks, or additional text. The response should be parseable directly by JSON.parse() in JavaScript.
+def parse_json_reply(text: str):
+    """Parse model output as JSON, tolerating a Markdown code fence around it."""
+    cleaned = (text or "").strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else ""
+        if cleaned.rstrip().endswith("```"):
+            cleaned = cleaned.rstrip()[:-3]
+    return json.loads(cleaned)
 
-Example of correct format:
-{{"sentimentAnalysis": "frustrated", "sentimentBrief": "Customer is frustrated with payment issues", "category": "BILLING_ISSUE"}}
 
-NOT like this:
-```json
-{{"sentimentAnalysis": "frustrated"}}
-```
-"""
+async def flowcode_demo_gemini_call(prompt: str):
+    """Classify a message with schema-constrained JSON output.
 
+    Returns the parsed object. Output that still fails to parse is retried
+    up to FLOWCODE_JSON_RETRIES times and counted in gemini_invalid_json_total.
+    """
+    client = get_gemini_client()
+    config = flowcode_config()
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash", contents=[enhanced_prompt]
-        )
-        text_json_reply = response.candidates[0].content.parts[0].text
+        for attempt in range(FLOWCODE_JSON_RETRIES + 1):
+            with stage_timer("gemini_json"):
+                response = await client.aio.models.generate_content(
+                    model=FLOWCODE_MODEL, contents=[prompt], config=config
+                )
+            text_json_reply = response.text
+            try:
+                return parse_json_reply(text_json_reply)
+            except json.JSONDecodeError as e:
+                retrying = attempt < FLOWCODE_JSON_RETRIES
+                GEMINI_INVALID_JSON.inc(
+                    endpoint="flowcode_demo", outcome="retried" if retrying else "failed"
+                )
+                print(f"Invalid JSON response: {e}")
+                print(f"Raw response: {text_json_reply}")
+        raise HTTPException(status_code=500, detail="Invalid JSON response from Gemini")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in flowcode_demo_gemini_call: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Clean up the response to remove any markdown formatting
-        cleaned_response = text_json_reply.strip()
-        if cleaned_response.startswith("```json"):
-            cleaned_response = cleaned_response[7:]  # Remove ```json
-        if cleaned_response.startswith("```"):
-            cleaned_response = cleaned_response[3:]  # Remove ```
-        if cleaned_response.endswith("```"):
-            cleaned_response = cleaned_response[:-3]  # Remove trailing ```
 
-        cleaned_response = cleaned_response.strip()
+async def flowcode_demo_gemini_stream(prompt: str):
+    """Stream schema-constrained JSON as Server-Sent Events.
 
-        # Validate that it's valid JSON
+    Each top-level field is sent as a ``field`` event as soon as its value is
+    complete; a final ``done`` event carries the whole parsed object. If the
+    client disconnects, the response is cancelled and the upstream stream
+    closed.
+    """
+    client = get_gemini_client()
+    stream = await client.aio.models.generate_content_stream(
+        model=FLOWCODE_MODEL, contents=[prompt], config=flowcode_config()
+    )
+
+    async def event_stream():
+        started = time.perf_counter()
+        parser = IncrementalJSONObject()
         try:
-            json.loads(cleaned_response)
-        except json.JSONDecodeError as e:
-            print(f"Invalid JSON response: {e}")
-            print(f"Raw response: {text_json_reply}")
-            raise HTTPException(
-                status_code=500, detail="Invalid JSON response from Gemini"
+            async for chunk in stream:
+                for name, value in parser.feed(chunk.text or ""):
+                    yield sse_event(
+                        {
+                            "field": name,
+                            "value": value,
+                            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                        },
+                        event="field",
+                    )
+            result = parser.result()
+            total_seconds = time.perf_counter() - started
+            STAGE_SECONDS.observe(total_seconds, stage="gemini_json_stream")
+            yield sse_event(
+                {"result": result, "total_ms": round(total_seconds * 1000, 1)},
+                event="done",
             )
+        except ValueError as e:
+            GEMINI_INVALID_JSON.inc(endpoint="flowcode_demo_stream", outcome="failed")
+            print(f"Invalid JSON in stream: {e}")
+            print(f"Raw response: {parser.buffer}")
+            yield sse_event({"error": "Invalid JSON response from Gemini"}, event="error")
+        except Exception as e:
+            print(f"Error in flowcode_demo_gemini_stream: {e}")
+            yield sse_event({"error": str(e)}, event="error")
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
-        return cleaned_response
-    except Exception as e:
-        print(f"Error in flowcode_demo_gemini_call: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
+def gemini_response_cache_key(kind: str, prompt: str, model=None, config=None) -> str:
+    """Cache key for a Gemini request: endpoint kind, prompt, model and config."""
+    if isinstance(config, types.GenerateContentConfig):
+        config = config.model_dump(mode="json", exclude_none=True)
+    payload = json.dumps([kind, prompt, model, config], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-def gemini_audio_call(
-    input_text=None,
+
+async def cached_gemini_call(kind: str, producer, prompt: str, model=None, config=None):
+    """Serve a deterministic Gemini request from the response cache.
+
+    ``producer()`` makes the upstream call on a miss; concurrent misses for
+    the same key share one call and failures are never cached. Returns
+    ``(result, cache_status)``, the status being HIT, MISS or COALESCED.
+    """
+    key = gemini_response_cache_key(kind, prompt, model, config)
+    cached = gemini_response_cache.get(key)
+    if cached is not None:
+        GEMINI_RESPONSE_CACHE_RESULTS.inc(kind=kind, result="hit")
+        return cached, "HIT"
+
+    async def fetch():
+        result = await producer()
+        gemini_response_cache.set(key, result)
+        return result
+
+    result, shared = await gemini_response_flights.do(key, fetch)
+    cache_status = "COALESCED" if shared else "MISS"
+    GEMINI_RESPONSE_CACHE_RESULTS.inc(kind=kind, result=cache_status.lower())
+    return result, cache_status
+
+
+def gemini_response_cache_stats():
+    return {
+        **gemini_response_cache.stats(),
+        "in_flight": len(gemini_response_flights),
+        "ttl_seconds": GEMINI_RESPONSE_CACHE_TTL,
+    }
+
+
+async def gemini_request(kind: str, prompt: str, model=None, cache=False):
+    """Run one /gemini ("text") or /flowcode_demo request.
+
+    Returns ``(result, cache_status)``; the status is BYPASS unless ``cache``
+    is set.
+    """
+    if kind == "flowcode_demo":
+        model, config = FLOWCODE_MODEL, flowcode_config()
+
+        def producer():
+            return flowcode_demo_gemini_call(prompt)
+
+    else:
+        config = None
+
+        def producer():
+            return gemini_text_call(prompt, model=model)
+
+    if not cache:
+        return await producer(), "BYPASS"
+    return await cached_gemini_call(kind, producer, prompt, model, config)
+
+
+async def gemini_batch_stream(
+    prompts, kind="text", model=None, cache=False, concurrency=GEMINI_BATCH_CONCURRENCY
 ):
-    if not input_text:
-        raise HTTPException(
-            status_code=400, detail="Input text is required for audio generation"
-        )
+    """Fan a batch of prompts out to Gemini and stream results as NDJSON.
+
+    At most ``concurrency`` requests are in flight. Each result line is sent
+    as soon as its item finishes, tagged with the item's input ``index``. A
+    failed or timed-out item produces an ``error`` line and does not hold up
+    the rest. The last line summarises the batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index, prompt):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result, cache_status = await asyncio.wait_for(
+                    gemini_request(kind, prompt, model=model, cache=cache),
+                    GEMINI_BATCH_ITEM_TIMEOUT,
+                )
+                if kind == "text":
+                    result = result.text
+                line = {"index": index, "result": result, "cache": cache_status}
+            except asyncio.TimeoutError:
+                line = {"index": index, "error": "Timed out", "status_code": 504}
+            except HTTPException as e:
+                line = {"index": index, "error": e.detail, "status_code": e.status_code}
+            except Exception as e:
+                line = {"index": index, "error": str(e), "status_code": 500}
+            line["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return line
+
+    async def result_stream():
+        started = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(run_item(index, prompt))
+            for index, prompt in enumerate(prompts)
+        ]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                failed += "error" in line
+                yield json.dumps(line) + "\n"
+            total_ms = round((time.perf_counter() - started) * 1000, 1)
+            log_event("gemini_batch", kind=kind, items=len(prompts), failed=failed, total_ms=total_ms)
+            yield json.dumps(
+                {
+                    "done": True,
+                    "total": len(prompts),
+                    "succeeded": len(prompts) - failed,
+                    "failed": failed,
+                    "total_ms": total_ms,
+                }
+            ) + "\n"
+        finally:
+            # The client went away: stop sending its remaining prompts upstream
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    try:
-        # Initialize Gemini client
-        client = genai.Client(api_key=gemini_api_key)
 
-        # Generate audio using Gemini TTS
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-preview-tts",
-            contents=[input_text],
-            config=types.GenerateContentConfig(
-                response_modalities=["AUDIO"],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name="Zephyr"
-                        ),
-                    ),
-                ),
+def tts_config(voice_name: str):
+    """Generation config for single-speaker Gemini TTS."""
+    return types.GenerateContentConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name),
             ),
+        ),
+    )
+
+
+async def synthesize_pcm(input_text: str, voice_name: str = DEFAULT_TTS_VOICE):
+    """Synthesize speech with Gemini TTS and return the raw PCM data."""
+    client = get_gemini_client()
+    with stage_timer("tts"):
+        response = await client.aio.models.generate_content(
+            model=TTS_MODEL,
+            contents=[input_text],
+            config=tts_config(voice_name),
         )
+    return response.candidates[0].content.parts[0].inline_data.data
+
+
+def split_script(text: str, max_chars: int = TTS_SEGMENT_CHARS):
+    """Split a script into segments at paragraph and sentence boundaries.
+
+    Sentences are packed together up to ``max_chars``; a paragraph break
+    always starts a new segment.
+    """
+    segments = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph.strip()):
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                segments.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            segments.append(current)
+    return segments
+
+
+async def synthesize_long_form_pcm(
+    input_text: str,
+    voice_name: str = DEFAULT_TTS_VOICE,
+    pause_ms: int = TTS_SEGMENT_PAUSE_MS,
+    rate=24000,
+    sample_width=2,
+):
+    """Synthesize a long script as parallel segments and splice the PCM in order."""
+    segments = split_script(input_text)
+    if len(segments) <= 1:
+        return await synthesize_pcm(input_text, voice_name)
+
+    semaphore = asyncio.Semaphore(TTS_MAX_PARALLEL)
 
-        # Extract the audio data (this is raw PCM data)
-        pcm_data = response.candidates[0].content.parts[0].inline_data.data
+    async def synthesize_segment(segment):
+        async with semaphore:
+            return await synthesize_pcm(segment, voice_name)
 
-        print(f"Audio generation successful. PCM length: {len(pcm_data)} bytes")
+    with stage_timer("tts_long_form"):
+        pcm_segments = await asyncio.gather(*map(synthesize_segment, segments))
+    log_event("tts_long_form", segments=len(segments))
 
-        # Convert PCM to WAV format using Google's recommended approach
-        wav_data = create_wav_from_pcm(pcm_data)
-        print(f"WAV conversion successful. WAV length: {len(wav_data)} bytes")
-        return wav_data
+    silence = b"\x00" * (int(rate * pause_ms / 1000) * sample_width)
+    return silence.join(pcm_segments)
+
+
+async def gemini_audio_call(
+    input_text=None,
+    voice_name=None,
+    long_form=False,
+    pause_ms=None,
+    output_format=None,
+):
+    if not input_text:
+        raise HTTPException(
+            status_code=400, detail="Input text is required for audio generation"
+        )
+    voice_name = voice_name or DEFAULT_TTS_VOICE
+    output_format = validate_output_format(output_format)
+    pause_ms = TTS_SEGMENT_PAUSE_MS if pause_ms is None else max(0, min(pause_ms, 2000))
+    cache_format = f"{output_format}/long-form-{pause_ms}ms" if long_form else output_format
+
+    async def synthesize():
+        if long_form:
+            pcm_data = await synthesize_long_form_pcm(input_text, voice_name, pause_ms)
+        else:
+            pcm_data = await synthesize_pcm(input_text, voice_name)
+
+        with stage_timer("encode_audio"):
+            audio_data = await encode_audio(pcm_data, output_format)
+        log_event(
+            "tts_audio",
+            output_format=output_format,
+            pcm_bytes=len(pcm_data),
+            audio_bytes=len(audio_data),
+        )
+        return audio_data
+
+    try:
+        # Identical scripts are served from the cache instead of re-synthesized
+        cache_key = tts_cache_key(input_text, voice_name, TTS_MODEL, cache_format)
+        return await tts_cache.get_or_create(cache_key, synthesize)
 
     except HTTPException:
         # Re-raise HTTPExceptions as-is
@@ -236,73 +686,312 @@ def gemini_audio_call(
         raise HTTPException(status_code=500, detail=f"Gemini TTS API error: {str(e)}")
 
 
-def generate_gemini_stream(prompt: str):
-    if not gemini_api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
-    client = genai.Client(api_key=gemini_api_key)
-    model = client.models.generate_content_stream(
+async def gemini_audio_stream(
+    input_text=None,
+    voice_name=None,
+):
+    """Stream synthesized speech as a WAV file while Gemini is producing it.
+
+    The header goes out immediately and PCM is forwarded chunk by chunk, so
+    memory use per request stays constant however long the audio is.
+    """
+    if not input_text:
+        raise HTTPException(
+            status_code=400, detail="Input text is required for audio generation"
+        )
+    voice_name = voice_name or DEFAULT_TTS_VOICE
+
+    # A clip that's already cached is complete, so just send it
+    cached = await tts_cache.lookup(
+        tts_cache_key(input_text, voice_name, TTS_MODEL, "wav")
+    )
+    if cached is not None:
+        return Response(content=cached, media_type="audio/wav")
+
+    client = get_gemini_client()
+    stream = await client.aio.models.generate_content_stream(
+        model=TTS_MODEL,
+        contents=[input_text],
+        config=tts_config(voice_name),
+    )
+
+    async def audio_stream():
+        yield wav_stream_header()
+        # Keep 16-bit samples whole across chunk boundaries
+        remainder = b""
+        streamed_bytes = 0
+        try:
+            async for chunk in stream:
+                if not chunk.candidates or not chunk.candidates[0].content:
+                    continue
+                for part in chunk.candidates[0].content.parts or []:
+                    if not part.inline_data or not part.inline_data.data:
+                        continue
+                    pcm_data = remainder + part.inline_data.data
+                    whole = len(pcm_data) - len(pcm_data) % 2
+                    remainder = pcm_data[whole:]
+                    if whole:
+                        streamed_bytes += whole
+                        yield pcm_data[:whole]
+            log_event("tts_stream", pcm_bytes=streamed_bytes)
+        except Exception as e:
+            print(f"Error in gemini_audio_stream: {e}")
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/wav",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def generate_gemini_stream(prompt: str, request=None):
+    """Stream a Gemini response to the client as Server-Sent Events.
+
+    Chunks are forwarded as soon as the upstream produces them, heartbeat
+    comments keep idle connections open, and the upstream stream is closed
+    as soon as the client goes away.
+    """
+    client = get_gemini_client()
+    stream = await client.aio.models.generate_content_stream(
         model="gemini-2.0-flash",
         contents=[prompt],
     )
 
     async def event_stream():
-        for chunk in model:
-            if chunk.text:
-                print(chunk.text)
-            yield json.dumps({"data": chunk.text if chunk.text else ""})
-            await asyncio.sleep(0.02)
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+        started = time.perf_counter()
+        last_chunk_at = started
+        first_token_ms = None
+        chunk_count = 0
+        chunk_gaps_ms = []
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(stream.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=SSE_HEARTBEAT_INTERVAL)
+                if not done:
+                    if request is not None and await request.is_disconnected():
+                        print("Client disconnected, cancelling Gemini stream")
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+
+                finished, pending = pending, None
+                try:
+                    chunk = finished.result()
+                except StopAsyncIteration:
+                    break
+
+                now = time.perf_counter()
+                if first_token_ms is None:
+                    first_token_ms = round((now - started) * 1000, 1)
+                    STAGE_SECONDS.observe(now - started, stage="gemini_stream_first_token")
+                else:
+                    chunk_gaps_ms.append(round((now - last_chunk_at) * 1000, 1))
+                last_chunk_at = now
+                chunk_count += 1
+
+                log_event("gemini_stream_chunk", index=chunk_count, chars=len(chunk.text or ""))
+                yield sse_event({"data": chunk.text if chunk.text else ""})
+
+            timings = {
+                "time_to_first_token_ms": first_token_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                "chunks": chunk_count,
+                "mean_chunk_gap_ms": (
+                    round(sum(chunk_gaps_ms) / len(chunk_gaps_ms), 1)
+                    if chunk_gaps_ms
+                    else None
+                ),
+                "max_chunk_gap_ms": max(chunk_gaps_ms) if chunk_gaps_ms else None,
+            }
+            STAGE_SECONDS.observe(timings["total_ms"] / 1000, stage="gemini_stream")
+            log_event("gemini_stream", **timings)
+            yield sse_event(timings, event="done")
+        except Exception as e:
+            print(f"Error in generate_gemini_stream: {e}")
+            yield sse_event({"error": str(e)}, event="error")
+        finally:
+            # Stop the upstream request so abandoned streams don't keep
+            # consuming Gemini quota.
+            if pending is not None:
+                pending.cancel()
+                try:
+                    await pending
+                except BaseException:
+                    pass
+            await stream.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
-async def upload_file_to_gcs(file: UploadFile = File(...)):
-    """Upload an audio file to Google Cloud Storage."""
-    credentials = get_google_credentials()
-    if not credentials:
-        raise HTTPException(
-            status_code=500, detail="Google Cloud credentials not configured"
+def get_upload_index():
+    """Return the content-hash index of uploaded objects, opening it on first use."""
+    global upload_index
+    if upload_index is None:
+        upload_index = UploadIndex()
+    return upload_index
+
+
+async def sign_blob_url(blob, method="GET", refresh=False):
+    """Return ``(signed_url, expires_at)`` for a blob, reusing a cached signature.
+
+    A cached URL is reused while it has at least SIGNED_URL_MIN_REMAINING
+    seconds left; ``refresh`` forces a new signature.
+    """
+    key = (blob.name, method)
+    if not refresh:
+        cached = signed_url_cache.get(key)
+        if cached is not None:
+            return cached
+
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=SIGNED_URL_TTL)
+    with stage_timer("sign_url"):
+        signed_url = await asyncio.to_thread(
+            blob.generate_signed_url,
+            version="v4",
+            expiration=timedelta(seconds=SIGNED_URL_TTL),
+            method=method,
         )
+    signed_url_cache.set(key, (signed_url, expires_at))
+    return signed_url, expires_at
 
-    if not gcs_storage_bucket:
-        raise HTTPException(status_code=500, detail="GCS_STORAGE_BUCKET not configured")
 
-    storage_client = storage.Client(credentials=credentials)
+async def get_signed_url(object_name: str, refresh=False):
+    """Signed GET URL for an object that is already in the bucket."""
+    try:
+        bucket = storage_bucket or await asyncio.to_thread(get_storage_bucket)
+        cached = None if refresh else signed_url_cache.get((object_name, "GET"))
+        if cached is not None:
+            signed_url, expires_at = cached
+        else:
+            blob = bucket.blob(object_name)
+            if not await asyncio.to_thread(blob.exists):
+                raise HTTPException(status_code=404, detail="Object not found")
+            signed_url, expires_at = await sign_blob_url(blob, refresh=True)
+        return {
+            "signed_url": signed_url,
+            "file_name": object_name,
+            "expires_at": expires_at.isoformat(),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Failed to sign URL for {object_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to sign URL. {e}")
+
 
-    # Debug storage client info
-    print(f"Storage client project: {storage_client.project}")
-    print(f"Target bucket name: {gcs_storage_bucket}")
+def find_uploaded_object(bucket, index, content_hash, file_extension):
+    """Object already holding this content, or None.
 
-    try:
-        bucket = storage_client.bucket(gcs_storage_bucket)
+    Index entries whose object has since been deleted from the bucket (by a
+    lifecycle rule or by hand) are dropped so the content is uploaded again.
+    """
+    object_name = index.get(content_hash, file_extension)
+    if object_name and not bucket.blob(object_name).exists():
+        print(f"Indexed object {object_name} no longer exists, uploading again")
+        index.delete(content_hash, file_extension)
+        return None
+    return object_name
 
-        # Test bucket access
-        print(f"Testing bucket access...")
-        bucket.reload()  # This will fail if we don't have access
-        print(f"Bucket location: {bucket.location}")
-        print(f"Bucket project: {bucket.project_number}")
 
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        blob = bucket.blob(unique_filename)
+async def upload_fileobj_to_gcs(file_obj, file_extension, content_type):
+    """Upload a seekable file object to GCS and return a signed URL for it.
 
-        blob.upload_from_file(file.file, content_type=file.content_type)
-        print(
-            f"File {file.filename} uploaded to gs://{gcs_storage_bucket}/{unique_filename}."
+    Objects are named by content hash; content that has been uploaded before
+    is not sent again. All blocking storage work runs in a worker thread,
+    and the body is streamed to GCS rather than read into memory. Per-stage
+    timings and throughput are returned under ``upload_stats``.
+    """
+    try:
+        started = time.perf_counter()
+        # The bucket is normally validated at startup; only check it here if
+        # that failed or hasn't happened yet
+        bucket = storage_bucket or await asyncio.to_thread(get_storage_bucket)
+        index = get_upload_index()
+        content_hash, size = await asyncio.to_thread(hash_file, file_obj)
+        object_name = await asyncio.to_thread(
+            find_uploaded_object, bucket, index, content_hash, file_extension
         )
+        prepared = time.perf_counter()
+
+        if object_name:
+            blob, upload_mode = bucket.blob(object_name), "deduplicated"
+            print(f"Skipping upload, content already stored as {object_name}")
+        else:
+            object_name = f"{content_hash}{file_extension}"
+            with stage_timer("gcs_upload"):
+                blob, upload_mode = await asyncio.to_thread(
+                    upload_stream, bucket, object_name, file_obj, size, content_type
+                )
+            await asyncio.to_thread(
+                index.put, content_hash, file_extension, object_name, size
+            )
+            print(f"Uploaded {size} bytes to gs://{gcs_storage_bucket}/{object_name}")
+        uploaded = time.perf_counter()
 
-        # Generate a signed URL for temporary access (expires in 1 hour)
-        signed_url = blob.generate_signed_url(
-            version="v4", expiration=3600, method="GET"  # 1 hour
-        )
+        # Signed URL for temporary access (expires in 1 hour)
+        signed_url, _ = await sign_blob_url(blob)
+        signed = time.perf_counter()
 
+        upload_seconds = uploaded - prepared
         response_data = {
-            "message": "File uploaded successfully",
+            "message": (
+                "File already uploaded"
+                if upload_mode == "deduplicated"
+                else "File uploaded successfully"
+            ),
             "signed_url": signed_url,
-            "file_name": unique_filename,
+            "file_name": object_name,
+            "deduplicated": upload_mode == "deduplicated",
+            "upload_stats": {
+                "bytes": size,
+                "mode": upload_mode,
+                "content_sha256": content_hash,
+                "prepare_ms": round((prepared - started) * 1000, 1),
+                "upload_ms": round(upload_seconds * 1000, 1),
+                "sign_ms": round((signed - uploaded) * 1000, 1),
+                "total_ms": round((signed - started) * 1000, 1),
+                "bytes_per_sec": (
+                    round(size / upload_seconds)
+                    if upload_seconds > 0 and upload_mode != "deduplicated"
+                    else None
+                ),
+            },
         }
         return response_data
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Failed to access bucket {gcs_storage_bucket}: {e}")
+        print(f"Failed to upload to bucket {gcs_storage_bucket}: {e}")
         raise HTTPException(
             status_code=500, detail=f"Failed to upload file to GCS. {e}"
         )
+
+
+async def upload_file_to_gcs(file: UploadFile = File(...), output_format=None):
+    """Upload an audio file to Google Cloud Storage.
+
+    When ``output_format`` is given, the uploaded WAV is converted first
+    (e.g. to 8 kHz mu-law for phone playback).
+    """
+    file_obj = file.file
+    content_type = file.content_type
+    file_extension = os.path.splitext(file.filename)[1]
+    if output_format:
+        output_format = validate_output_format(output_format)
+        try:
+            audio_data = await transcode_wav(await file.read(), output_format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        file_obj = io.BytesIO(audio_data)
+        content_type = OUTPUT_FORMATS[output_format]
+        file_extension = FILE_EXTENSIONS[output_format]
+
+    return await upload_fileobj_to_gcs(file_obj, file_extension, content_type)
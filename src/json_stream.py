@@ -0,0 +1,81 @@
+import json
+
+WHITESPACE = " \t\n\r"
+
+
+class IncrementalJSONObject:
+    """Parse a JSON object from text that arrives in chunks.
+
+    Top-level fields are returned by ``feed`` as soon as their value is
+    complete, so callers can act on them before the rest of the object has
+    been generated. ``result()`` validates and returns the whole object.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.closed = False
+        self._decoder = json.JSONDecoder()
+        self._pos = None
+
+    def feed(self, text: str):
+        """Add more text; returns a list of newly completed ``(name, value)`` fields."""
+        self.buffer += text
+        completed = []
+        while not self.closed:
+            field = self._next_field()
+            if field is None:
+                break
+            completed.append(field)
+        return completed
+
+    def _skip(self, pos, chars=WHITESPACE):
+        while pos < len(self.buffer) and self.buffer[pos] in chars:
+            pos += 1
+        return pos
+
+    def _next_field(self):
+        if self._pos is None:
+            # Find the opening brace, tolerating a leading Markdown fence
+            start = self.buffer.find("{")
+            if start < 0:
+                return None
+            self._pos = start + 1
+
+        pos = self._skip(self._pos, WHITESPACE + ",")
+        if pos >= len(self.buffer):
+            return None
+        if self.buffer[pos] == "}":
+            self.closed = True
+            return None
+        try:
+            name, pos = self._decoder.raw_decode(self.buffer, pos)
+        except json.JSONDecodeError:
+            return None
+        pos = self._skip(pos)
+        if pos >= len(self.buffer):
+            return None
+        if self.buffer[pos] != ":":
+            raise ValueError(f"Expected ':' after field {name!r}")
+        pos = self._skip(pos + 1)
+        if pos >= len(self.buffer):
+            return None
+        try:
+            value, end = self._decoder.raw_decode(self.buffer, pos)
+        except json.JSONDecodeError:
+            return None
+        # A number or literal is only complete once a delimiter follows it;
+        # until then "12" may still grow into "12.5"
+        if not isinstance(value, (str, list, dict)):
+            delimiter = self._skip(end)
+            if delimiter >= len(self.buffer) or self.buffer[delimiter] not in ",}":
+                return None
+        self._pos = end
+        self.fields[name] = value
+        return name, value
+
+    def result(self) -> dict:
+        """The complete object; raises ValueError if the text is not one."""
+        if not self.closed:
+            raise ValueError("JSON object is incomplete")
+        return self.fields
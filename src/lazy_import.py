@@ -0,0 +1,38 @@
+import os
+import sys
+import importlib.util
+
+# "eager" imports the upstream SDK modules while the app is created; "lazy"
+# defers them to first use or a background warm-up for faster cold starts
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager").lower()
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self):
+        """Import the module now (thread-safe; safe to call repeatedly)."""
+        if self._module is None:
+            # __import__ (not importlib.import_module) so -X importtime sees it
+            __import__(self._name)
+            self._module = sys.modules[self._name]
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+def module_available(*names: str) -> bool:
+    """Whether every named module can be found, without importing it."""
+    try:
+        return all(importlib.util.find_spec(name) is not None for name in names)
+    except (ImportError, ValueError):
+        return False
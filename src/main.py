@@ -1,25 +1,148 @@
-from typing import Union, Literal
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, Security
+from typing import List, Union, Literal
+from fastapi import (
+    FastAPI,
+    UploadFile,
+    File,
+    HTTPException,
+    Form,
+    Depends,
+    Security,
+    Request,
+)
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import os
+import time
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
 from datetime import datetime
 import secrets
 
-app = FastAPI(title="Answering Machine API", version="1.0.0")
+from call_store import (
+    CALL_FIELDS,
+    create_call_store,
+    decode_cursor,
+    encode_cursor,
+    new_call_record,
+)
+from campaigns import TWILIO_CALLS_PER_SECOND, CampaignDispatcher, SharedTokenBucket
+from call_events import CallEventBroker, relay_store_events, stream_call_events
+from callbacks import TERMINAL_STATUSES, CallbackIngestor, status_rank
+from lazy_import import STARTUP_MODE, LazyModule, module_available
+from metrics import Gauge, MetricsMiddleware, metrics_writer, render_metrics
+
+
+# Open upstream connections on startup so a worker's first requests don't
+# pay for TLS handshakes (in eager mode uvicorn only routes traffic once this
+# finishes; in lazy mode it runs in the background after startup)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "10"))
+
+
+async def start_upstream_services():
+    """Import the upstream modules and create their shared clients."""
+    if GOOGLE_AVAILABLE:
+        # Imported off the event loop so lazy mode keeps serving meanwhile
+        await asyncio.to_thread(google_calls.load)
+        await asyncio.to_thread(audio_formats.load)
+        await google_calls.start_google_services()
+    if TWILIO_AVAILABLE:
+        await asyncio.to_thread(twilio_calls.load)
+        twilio_calls.init_twilio_client()
+    if STARTUP_WARMUP:
+        warmups = []
+        if GOOGLE_AVAILABLE:
+            warmups.append(google_calls.warm_gemini_client())
+        if TWILIO_AVAILABLE:
+            warmups.append(twilio_calls.warm_twilio_client())
+        try:
+            await asyncio.wait_for(asyncio.gather(*warmups), STARTUP_WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("Upstream warm-up timed out, continuing startup")
+
+
+async def start_upstream_services_in_background():
+    started = time.perf_counter()
+    try:
+        await start_upstream_services()
+        print(f"Background warm-up finished in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"Background warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared upstream clients on startup and close them on shutdown."""
+    await call_store.start()
+    # With a shared store, callbacks may be applied by any worker
+    relay_task = (
+        asyncio.create_task(relay_store_events(call_events, call_store))
+        if call_store.shared
+        else None
+    )
+    metrics_task = asyncio.create_task(metrics_writer())
+    warmup_task = None
+    if STARTUP_MODE == "lazy":
+        warmup_task = asyncio.create_task(start_upstream_services_in_background())
+    else:
+        await start_upstream_services()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+    if TWILIO_AVAILABLE:
+        await campaign_dispatcher.stop()
+        if twilio_calls.loaded:
+            await twilio_calls.close_twilio_client()
+    await callback_ingestor.stop()
+    if relay_task is not None:
+        relay_task.cancel()
+    metrics_task.cancel()
+    await asyncio.gather(metrics_task, return_exceptions=True)
+    await call_store.stop()
+    if GOOGLE_AVAILABLE and google_calls.loaded:
+        await google_calls.stop_google_services()
+
+
+app = FastAPI(title="Answering Machine API", version="1.0.0", lifespan=lifespan)
 
 # Authentication setup
 security = HTTPBearer()
 API_KEY = os.getenv("RICK_ROLL_API_KEY")
 
+# Generated development keys are kept here so every worker uses the same one
+DEV_API_KEY_PATH = os.getenv("DEV_API_KEY_PATH", "/tmp/answering-machine/dev_api_key")
+
+
+def load_dev_api_key() -> str:
+    """Return the development API key, generating it if no worker has yet."""
+    os.makedirs(os.path.dirname(DEV_API_KEY_PATH) or ".", exist_ok=True)
+    try:
+        fd = os.open(DEV_API_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker won the race; wait for it to finish writing
+        for _ in range(50):
+            with open(DEV_API_KEY_PATH) as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.1)
+        raise RuntimeError(f"Development API key file {DEV_API_KEY_PATH} is empty")
+    key = secrets.token_urlsafe(32)
+    with os.fdopen(fd, "w") as f:
+        f.write(key)
+    return key
+
+
 # Generate a secure API key if none is provided (for development)
 if not API_KEY:
     print(
-        "⚠️  WARNING: No API_KEY environment variable found. Generating a temporary one for development."
+        "⚠️  WARNING: No API_KEY environment variable found. Using a generated one for development."
     )
-    API_KEY = secrets.token_urlsafe(32)
+    API_KEY = load_dev_api_key()
     print(f"🔑 Development API Key: {API_KEY}")
     print("   Add this to your frontend and environment variables!")
 
@@ -40,54 +163,76 @@ def verify_api_key(
     return credentials.credentials
 
 
-# Simple in-memory storage for call history (for tech demo purposes)
-call_history = {}
+# Call records live in a shared store (SQLite by default) so every worker
+# sees the same history and it survives restarts
+call_store = create_call_store()
+# Applied status callbacks are pushed to SSE subscribers; a shared store
+# relays them from its event log instead (see lifespan)
+call_events = CallEventBroker()
+callback_ingestor = CallbackIngestor(
+    call_store, on_applied=None if call_store.shared else call_events.publish
+)
+# Page sizes for GET /twilio/calls
+CALLS_PAGE_SIZE = int(os.getenv("CALLS_PAGE_SIZE", "50"))
+CALLS_MAX_PAGE_SIZE = int(os.getenv("CALLS_MAX_PAGE_SIZE", "500"))
+
+
+async def record_call(call_sid: str, to_phone_number: str, audio_file_url: str):
+    """Store a newly placed call."""
+    await call_store.create(new_call_record(call_sid, to_phone_number, audio_file_url))
+    print(f"📝 Stored call {call_sid} in call store")
+
 
 # Add startup logging
 print("Starting Answering Machine API...")
 print("FastAPI app created successfully")
 
-# Debug: Check if files exist
-print(f"Current working directory: {os.getcwd()}")
-print(f"Files in current directory: {os.listdir('.')}")
-print(
-    f"Files in src directory: {os.listdir('src') if os.path.exists('src') else 'src directory not found'}"
-)
-
-# Try to import Google functionality
-try:
-    print("Attempting to import google_calls...")
-    from google_calls import (
-        gemini_text_call,
-        gemini_audio_call,
-        generate_gemini_stream,
-        sanity_check,
-        upload_file_to_gcs,
-        flowcode_demo_gemini_call,
+# Upstream modules are reached through LazyModule proxies so the routes below
+# are registered the same way whether they are imported now or on first use
+google_calls = LazyModule("google_calls")
+audio_formats = LazyModule("audio_formats")
+twilio_calls = LazyModule("twilio_calls")
+pipeline = LazyModule("pipeline")
+
+if STARTUP_MODE == "lazy":
+    # Only check that the SDKs are installed; importing them is deferred
+    GOOGLE_AVAILABLE = module_available(
+        "google.genai", "google.cloud.storage", "google.auth", "numpy"
     )
-
-    print("Google functionality imported successfully")
-    GOOGLE_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Google functionality not available: {e}")
-    print(f"Import error type: {type(e)}")
-    print(f"Import error details: {str(e)}")
-    GOOGLE_AVAILABLE = False
-except Exception as e:
-    print(f"Unexpected error importing Google functionality: {e}")
-    print(f"Error type: {type(e)}")
-    GOOGLE_AVAILABLE = False
-
-# Try to import Twilio functionality
-try:
-    print("Attempting to import twilio_calls...")
-    from twilio_calls import make_twilio_call, get_twilio_status, get_call_status
-
-    print("Twilio functionality imported successfully")
-    TWILIO_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Twilio functionality not available: {e}")
-    TWILIO_AVAILABLE = False
+    TWILIO_AVAILABLE = module_available("twilio")
+    print(
+        f"Lazy startup: Google available={GOOGLE_AVAILABLE}, "
+        f"Twilio available={TWILIO_AVAILABLE}"
+    )
+else:
+    # Try to import Google functionality
+    try:
+        print("Attempting to import google_calls...")
+        google_calls.load()
+        audio_formats.load()
+
+        print("Google functionality imported successfully")
+        GOOGLE_AVAILABLE = True
+    except ImportError as e:
+        print(f"Warning: Google functionality not available: {e}")
+        print(f"Import error type: {type(e)}")
+        print(f"Import error details: {str(e)}")
+        GOOGLE_AVAILABLE = False
+    except Exception as e:
+        print(f"Unexpected error importing Google functionality: {e}")
+        print(f"Error type: {type(e)}")
+        GOOGLE_AVAILABLE = False
+
+    # Try to import Twilio functionality
+    try:
+        print("Attempting to import twilio_calls...")
+        twilio_calls.load()
+
+        print("Twilio functionality imported successfully")
+        TWILIO_AVAILABLE = True
+    except ImportError as e:
+        print(f"Warning: Twilio functionality not available: {e}")
+        TWILIO_AVAILABLE = False
 
 # Update origins to include Cloud Run URLs
 origins = [
@@ -107,25 +252,44 @@ app.add_middleware(
 
 print("CORS middleware added successfully")
 
+# Outermost, so the latency it records includes CORS handling
+app.add_middleware(MetricsMiddleware)
+
+Gauge(
+    "callback_queue_depth",
+    "Status callbacks waiting to be applied",
+    fn=lambda: callback_ingestor.stats()["queue_depth"],
+)
+Gauge(
+    "call_event_subscribers",
+    "Open call status SSE streams",
+    fn=lambda: call_events.stats()["subscribers"],
+)
+
+
+@app.get("/metrics")
+async def metrics(api_key: str = Depends(verify_api_key)):
+    """Request latency, per-stage timings and counters in Prometheus text format"""
+    return Response(
+        content=render_metrics(), media_type="text/plain; version=0.0.4"
+    )
+
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    print("Root endpoint called")
     return {"message": "Answering Machine API is running", "status": "healthy"}
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Cloud Run"""
-    print("Health check endpoint called")
     return {"status": "healthy", "service": "answering-machine-api"}
 
 
 @app.get("/test")
 async def test():
     """Simple test endpoint"""
-    print("Test endpoint called")
     return {"message": "Test endpoint working"}
 
 
@@ -134,6 +298,30 @@ class GeminiRequest(BaseModel):
     prompt: str
     model: Union[str, None] = None
     return_type: Union[Literal["text"], Literal["json"], None] = None
+    # Serve repeated prompts from the response cache (see X-Cache header)
+    cache: bool = False
+
+
+class GeminiBatchRequest(BaseModel):
+    prompts: List[str]
+    # "text" runs each prompt like /gemini, "flowcode_demo" like /flowcode_demo
+    kind: Union[Literal["text"], Literal["flowcode_demo"]] = "text"
+    model: Union[str, None] = None
+    cache: bool = False
+    concurrency: Union[int, None] = None
+
+
+class GeminiAudioRequest(BaseModel):
+    # Audio is always served from the TTS cache, so there is no "cache" flag
+    prompt: str
+    model: Union[str, None] = None
+    return_type: Union[Literal["text"], Literal["json"], None] = None
+    voice: Union[str, None] = None
+    long_form: bool = False
+    pause_ms: Union[int, None] = None
+    output_format: Union[
+        Literal["wav"], Literal["wav_mulaw_8k"], Literal["mp3"], None
+    ] = None
 
 
 class TwilioCallRequest(BaseModel):
@@ -141,6 +329,20 @@ class TwilioCallRequest(BaseModel):
     audio_file_url: str
 
 
+class CampaignRequest(BaseModel):
+    calls: List[TwilioCallRequest]
+
+
+class PipelineRequest(BaseModel):
+    prompt: str
+    to_phone_number: str
+    generate_script: bool = True
+    voice: Union[str, None] = None
+    output_format: Union[Literal["wav"], Literal["wav_mulaw_8k"], Literal["mp3"]] = (
+        "wav_mulaw_8k"
+    )
+
+
 class CallRecord(BaseModel):
     call_sid: str
     to_phone_number: str
@@ -158,26 +360,71 @@ if GOOGLE_AVAILABLE:
     print("Registering Google endpoints...")
 
     @app.post("/sanity_check")
-    def call_sanity_check(api_key: str = Depends(verify_api_key)):
+    async def call_sanity_check(api_key: str = Depends(verify_api_key)):
         return {"status": True}
 
     @app.post("/gemini")
-    def call_gemini(request: GeminiRequest, api_key: str = Depends(verify_api_key)):
-        response = gemini_text_call(request.prompt)
+    async def call_gemini(
+        request: GeminiRequest,
+        http_response: Response,
+        api_key: str = Depends(verify_api_key),
+    ):
+        response, cache_status = await google_calls.gemini_request(
+            "text", request.prompt, model=request.model, cache=request.cache
+        )
+        http_response.headers["X-Cache"] = cache_status
         return {"prompt": request.prompt, "response": response}
 
+    @app.post("/gemini/batch")
+    async def call_gemini_batch(
+        request: GeminiBatchRequest, api_key: str = Depends(verify_api_key)
+    ):
+        """Run many prompts concurrently; results stream back as NDJSON in completion order"""
+        if not request.prompts:
+            raise HTTPException(status_code=400, detail="prompts must not be empty")
+        if len(request.prompts) > google_calls.GEMINI_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {google_calls.GEMINI_BATCH_MAX_ITEMS} prompts per batch",
+            )
+        concurrency = min(
+            request.concurrency or google_calls.GEMINI_BATCH_CONCURRENCY,
+            google_calls.GEMINI_BATCH_MAX_CONCURRENCY,
+        )
+        return await google_calls.gemini_batch_stream(
+            request.prompts,
+            kind=request.kind,
+            model=request.model,
+            cache=request.cache,
+            concurrency=max(1, concurrency),
+        )
+
+    @app.get("/gemini/cache")
+    async def get_gemini_cache_stats(api_key: str = Depends(verify_api_key)):
+        """Hit/miss counters and size of the /gemini and /flowcode_demo response cache"""
+        return google_calls.gemini_response_cache_stats()
+
     @app.post("/gemini/audio")
-    def call_gemini_audio(
-        request: GeminiRequest, api_key: str = Depends(verify_api_key)
+    async def call_gemini_audio(
+        request: GeminiAudioRequest, api_key: str = Depends(verify_api_key)
     ):
         try:
-            response = gemini_audio_call(request.prompt)
+            response = await google_calls.gemini_audio_call(
+                request.prompt,
+                request.voice,
+                long_form=request.long_form,
+                pause_ms=request.pause_ms,
+                output_format=request.output_format,
+            )
             if response is None:
                 raise HTTPException(
                     status_code=500,
                     detail="Audio generation failed - no audio content returned",
                 )
-            return Response(content=response, media_type="audio/wav")
+            return Response(
+                content=response,
+                media_type=audio_formats.OUTPUT_FORMATS[request.output_format or "wav"],
+            )
         except HTTPException:
             # Re-raise HTTPExceptions as-is
             raise
@@ -186,30 +433,85 @@ if GOOGLE_AVAILABLE:
                 status_code=500, detail=f"Audio generation error: {str(e)}"
             )
 
+    @app.post("/gemini/audio/stream")
+    async def call_gemini_audio_stream(
+        request: GeminiAudioRequest, api_key: str = Depends(verify_api_key)
+    ):
+        """Stream WAV audio as it is synthesized for a low time-to-first-byte.
+
+        Only 24 kHz PCM WAV in a single segment can be streamed; use
+        /gemini/audio for long_form, pause_ms or other output formats.
+        """
+        unsupported = [
+            option
+            for option, value in (
+                ("long_form", request.long_form),
+                ("pause_ms", request.pause_ms is not None),
+                ("output_format", request.output_format not in (None, "wav")),
+            )
+            if value
+        ]
+        if unsupported:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not supported when streaming: {', '.join(unsupported)}",
+            )
+        return await google_calls.gemini_audio_stream(request.prompt, request.voice)
+
+    @app.get("/gemini/audio/cache")
+    async def get_gemini_audio_cache_stats(api_key: str = Depends(verify_api_key)):
+        """Hit/miss counters and sizes for the TTS result cache"""
+        return google_calls.tts_cache.stats()
+
     @app.post("/gemini/stream")
-    async def gemini_stream(data: dict, api_key: str = Depends(verify_api_key)):
+    async def gemini_stream(
+        data: dict, request: Request, api_key: str = Depends(verify_api_key)
+    ):
         prompt = data.get("prompt")
         if not prompt:
             raise HTTPException(status_code=400, detail="Prompt is required")
-        return generate_gemini_stream(prompt)
+        return await google_calls.generate_gemini_stream(prompt, request)
 
     @app.post("/gcs/upload")
     async def call_upload_audio_file_to_gcs(
-        file: UploadFile = File(...), api_key: str = Depends(verify_api_key)
+        file: UploadFile = File(...),
+        output_format: str = Form(None),
+        api_key: str = Depends(verify_api_key),
     ):
         try:
-            response = await upload_file_to_gcs(file)
+            response = await google_calls.upload_file_to_gcs(file, output_format)
             return response
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    @app.get("/gcs/signed_url/{object_name:path}")
+    async def call_get_signed_url(
+        object_name: str, refresh: bool = False, api_key: str = Depends(verify_api_key)
+    ):
+        """Get (or re-sign) a signed URL for an already uploaded object"""
+        return await google_calls.get_signed_url(object_name, refresh=refresh)
+
     @app.post("/flowcode_demo")
-    def call_flowcode_demo(
-        request: GeminiRequest, api_key: str = Depends(verify_api_key)
+    async def call_flowcode_demo(
+        request: GeminiRequest,
+        http_response: Response,
+        api_key: str = Depends(verify_api_key),
     ):
-        response = flowcode_demo_gemini_call(request.prompt)
+        response, cache_status = await google_calls.gemini_request(
+            "flowcode_demo", request.prompt, cache=request.cache
+        )
+        http_response.headers["X-Cache"] = cache_status
         return response
 
+    @app.post("/flowcode_demo/stream")
+    async def call_flowcode_demo_stream(
+        request: GeminiRequest, api_key: str = Depends(verify_api_key)
+    ):
+        """Stream each JSON field as soon as the model has produced it"""
+        return await google_calls.flowcode_demo_gemini_stream(request.prompt)
+
     print("Google endpoints registered successfully")
 else:
     print("Google endpoints NOT registered - functionality not available")
@@ -220,63 +522,193 @@ if TWILIO_AVAILABLE:
     print("Registering Twilio endpoints...")
 
     @app.get("/twilio/status")
-    def call_twilio_status(api_key: str = Depends(verify_api_key)):
+    async def call_twilio_status(api_key: str = Depends(verify_api_key)):
         """Get Twilio account status and balance information"""
-        response = get_twilio_status()
+        response = await twilio_calls.get_twilio_status()
         return response
 
     @app.get("/twilio/call/{call_sid}/status")
-    def get_twilio_call_status(call_sid: str, api_key: str = Depends(verify_api_key)):
+    async def get_twilio_call_status(
+        call_sid: str, api_key: str = Depends(verify_api_key)
+    ):
         """Get status of a specific Twilio call"""
-        # First check our local storage
-        if call_sid in call_history:
-            stored_call = call_history[call_sid]
+        # First check our local storage. Calls we placed are kept current by
+        # status callbacks; anything else is only trusted once it's finished.
+        stored_call = await call_store.get(call_sid)
+        if stored_call is not None and (
+            stored_call["audio_file_url"] or stored_call["status"] in TERMINAL_STATUSES
+        ):
             return {"success": True, "source": "local_storage", **stored_call}
 
-        # Fall back to Twilio API
-        response = get_call_status(call_sid)
-        return response
+        # Fall back to Twilio API (cached and coalesced per SID)
+        return await twilio_calls.lookup_call_status(call_sid, on_fetched=store_fetched_call)
+
+    async def store_fetched_call(result: dict):
+        """Write a call fetched from Twilio back to the call store."""
+        call_sid = result["call_sid"]
+        record = new_call_record(call_sid, result["to"], None)
+        if result.get("date_created"):
+            # Twilio reports UTC; stored times are local, like datetime.now()
+            record["created_at"] = (
+                datetime.fromisoformat(result["date_created"])
+                .astimezone()
+                .replace(tzinfo=None)
+                .isoformat()
+            )
+        # Only inserted if absent; an existing record is never overwritten
+        await call_store.create(record)
+        await call_store.update_status(
+            call_sid,
+            {
+                "status": result["status"],
+                "updated_at": datetime.now().isoformat(),
+                "duration": result["duration"],
+                "price": result["price"],
+            },
+            status_rank(result["status"]),
+            -1,
+        )
 
-    @app.post("/twilio/call/{call_sid}/status")
+    async def apply_status_callback(
+        call_sid, status, duration, price, error_message, sequence_number
+    ):
+        """Queue a Twilio status callback and acknowledge it straight away."""
+        # Applied to the store in batches; duplicates and out-of-order
+        # events are resolved there (a callback that beats the call record
+        # being written still lands, as a partial record)
+        await callback_ingestor.submit(
+            call_sid, status, duration, price, error_message, sequence_number
+        )
+
+        # Return TwiML response (required by Twilio)
+        return Response(content="<Response></Response>", media_type="application/xml")
+
+    @app.post("/twilio/call/status")
     async def handle_twilio_status_callback(
-        call_sid: str,
+        CallSid: str = Form(...),
         CallStatus: str = Form(...),
         CallDuration: str = Form(None),
         CallPrice: str = Form(None),
         ErrorMessage: str = Form(None),
+        SequenceNumber: str = Form(None),
         # Twilio sends many more fields, but these are the key ones
     ):
         """Handle Twilio status callback webhook - NO AUTH required as Twilio calls this directly"""
-        print(f"📞 Callback received for call {call_sid}: {CallStatus}")
-
-        # Update our stored call record
-        if call_sid in call_history:
-            call_history[call_sid].update(
-                {
-                    "status": CallStatus,
-                    "updated_at": datetime.now().isoformat(),
-                    "duration": CallDuration,
-                    "price": CallPrice,
-                    "error_message": ErrorMessage,
-                }
-            )
-            print(f"✅ Updated call {call_sid} in storage")
-        else:
-            # This shouldn't happen, but let's handle it gracefully
-            print(f"⚠️  Received callback for unknown call {call_sid}")
+        return await apply_status_callback(
+            CallSid, CallStatus, CallDuration, CallPrice, ErrorMessage, SequenceNumber
+        )
 
-        # Return TwiML response (required by Twilio)
-        return Response(content="<Response></Response>", media_type="application/xml")
+    @app.post("/twilio/call/{call_sid}/status")
+    async def handle_legacy_twilio_status_callback(
+        call_sid: str,
+        CallStatus: str = Form(...),
+        CallDuration: str = Form(None),
+        CallPrice: str = Form(None),
+        ErrorMessage: str = Form(None),
+        SequenceNumber: str = Form(None),
+    ):
+        """Per-call callback URL used by calls placed before callbacks were
+        attached at creation time - NO AUTH required"""
+        return await apply_status_callback(
+            call_sid, CallStatus, CallDuration, CallPrice, ErrorMessage, SequenceNumber
+        )
 
-    @app.get("/twilio/calls")
-    def get_all_calls(api_key: str = Depends(verify_api_key)):
-        """Get all calls from local storage (for tech demo purposes)"""
+    @app.get("/twilio/callbacks/metrics")
+    async def get_callback_metrics(api_key: str = Depends(verify_api_key)):
+        """Status-callback queue depth, batching and apply latency"""
         return {
             "success": True,
-            "calls": list(call_history.values()),
-            "total_calls": len(call_history),
+            **callback_ingestor.stats(),
+            "events": call_events.stats(),
         }
 
+    @app.get("/twilio/call/{call_sid}/events")
+    async def stream_twilio_call_events(
+        call_sid: str, request: Request, api_key: str = Depends(verify_api_key)
+    ):
+        """Server-Sent Events for one call's status changes; ends once the call finishes"""
+        return stream_call_events(
+            call_events, request, call_sid, snapshot=lambda: call_store.get(call_sid)
+        )
+
+    @app.get("/twilio/calls/events")
+    async def stream_all_call_events(
+        request: Request, api_key: str = Depends(verify_api_key)
+    ):
+        """Server-Sent Events for status changes of every call"""
+        return stream_call_events(call_events, request)
+
+    @app.get("/twilio/calls")
+    async def get_all_calls(
+        request: Request,
+        status: str = None,
+        phone: str = None,
+        since: str = None,
+        until: str = None,
+        cursor: str = None,
+        limit: int = CALLS_PAGE_SIZE,
+        fields: str = None,
+        api_key: str = Depends(verify_api_key),
+    ):
+        """Page through stored calls, oldest first.
+
+        Pass the returned ``next_cursor`` as ``cursor`` to fetch the next page.
+        ``fields`` is a comma-separated list of columns to return. Responses
+        carry an ETag; an unchanged page returns 304 for If-None-Match.
+        """
+        if not 1 <= limit <= CALLS_MAX_PAGE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"limit must be between 1 and {CALLS_MAX_PAGE_SIZE}",
+            )
+        try:
+            after = decode_cursor(cursor) if cursor else None
+            since = datetime.fromisoformat(since).isoformat() if since else None
+            until = datetime.fromisoformat(until).isoformat() if until else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        selected = fields.split(",") if fields else CALL_FIELDS
+        unknown = [field for field in selected if field not in CALL_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+
+        # Fetch one extra row to learn whether another page exists; the
+        # cursor and ETag columns are always read, then projected away
+        calls = await call_store.list(
+            status=status,
+            to_phone_number=phone,
+            since=since,
+            until=until,
+            after=after,
+            limit=limit + 1,
+            fields=set(selected) | {"call_sid", "created_at", "updated_at"},
+        )
+        next_cursor = encode_cursor(calls[limit - 1]) if len(calls) > limit else None
+        calls = calls[:limit]
+        total_calls = await call_store.count()
+
+        etag_source = [str(request.query_params), str(total_calls)] + [
+            f"{call['call_sid']}:{call['updated_at']}" for call in calls
+        ]
+        digest = hashlib.sha1("\n".join(etag_source).encode("utf-8")).hexdigest()
+        etag = f'"{digest}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        return JSONResponse(
+            {
+                "success": True,
+                "calls": [{field: call[field] for field in selected} for call in calls],
+                "count": len(calls),
+                "total_calls": total_calls,
+                "next_cursor": next_cursor,
+            },
+            headers={"ETag": etag},
+        )
+
     @app.post("/twilio/call")
     async def call_make_twilio_call(
         request: TwilioCallRequest, api_key: str = Depends(verify_api_key)
@@ -290,32 +722,108 @@ if TWILIO_AVAILABLE:
         # return requestEcho  # FastAPI automatically converts to JSON
 
         # actual call
-        response = await make_twilio_call(
+        response = await twilio_calls.make_twilio_call(
             request.to_phone_number, request.audio_file_url
         )
 
         # Store call information in our simple storage
-        call_sid = response["call_sid"]
-        now = datetime.now()
-        call_history[call_sid] = {
-            "call_sid": call_sid,
-            "to_phone_number": request.to_phone_number,
-            "audio_file_url": request.audio_file_url,
-            "status": "queued",  # Initial status
-            "created_at": now.isoformat(),
-            "updated_at": now.isoformat(),
-            "duration": None,
-            "price": None,
-            "error_message": None,
-        }
-
-        print(f"📝 Stored call {call_sid} in local storage")
+        if response.get("success"):
+            await record_call(
+                response["call_sid"], request.to_phone_number, request.audio_file_url
+            )
         return response
 
+    # Bulk campaigns are placed by a rate-limited background dispatcher
+    async def save_campaign(campaign: dict):
+        await call_store.put_state("campaign", campaign["campaign_id"], campaign)
+
+    async def place_call(to_phone_number: str, audio_file_url: str):
+        return await twilio_calls.make_twilio_call(to_phone_number, audio_file_url)
+
+    # With a shared store every worker draws from one account-wide call rate
+    campaign_dispatcher = CampaignDispatcher(
+        place_call,
+        record_call,
+        on_update=save_campaign,
+        bucket=(
+            SharedTokenBucket(call_store, "twilio_calls", TWILIO_CALLS_PER_SECOND)
+            if call_store.shared
+            else None
+        ),
+    )
+
+    @app.post("/twilio/campaigns", status_code=202)
+    async def call_start_campaign(
+        request: CampaignRequest, api_key: str = Depends(verify_api_key)
+    ):
+        """Queue a batch of outbound calls"""
+        if not request.calls:
+            raise HTTPException(status_code=400, detail="At least one call is required")
+        campaign = await campaign_dispatcher.submit(
+            [(call.to_phone_number, call.audio_file_url) for call in request.calls]
+        )
+        return {"campaign_id": campaign["campaign_id"], "total": campaign["total"]}
+
+    @app.get("/twilio/campaigns/{campaign_id}")
+    async def call_get_campaign(
+        campaign_id: str,
+        include_calls: bool = False,
+        api_key: str = Depends(verify_api_key),
+    ):
+        """Progress of a call campaign"""
+        # Campaigns accepted by another worker are read from the shared store
+        campaign = campaign_dispatcher.get(campaign_id) or await call_store.get_state(
+            "campaign", campaign_id
+        )
+        if campaign is None:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        if include_calls:
+            return campaign
+        return {key: value for key, value in campaign.items() if key != "calls"}
+
     print("Twilio endpoints registered successfully")
 else:
     print("Twilio endpoints NOT registered - functionality not available")
 
 
+# Server-side pipeline: prompt -> text -> TTS -> storage -> call
+if GOOGLE_AVAILABLE and TWILIO_AVAILABLE:
+    async def save_pipeline_job(job: dict):
+        await call_store.put_state("pipeline_job", job["job_id"], job)
+
+    @app.post("/pipeline", status_code=202)
+    async def call_start_pipeline(
+        request: PipelineRequest, api_key: str = Depends(verify_api_key)
+    ):
+        """Generate audio and place a call in one background job"""
+        if not request.prompt:
+            raise HTTPException(status_code=400, detail="Prompt is required")
+        if not request.to_phone_number:
+            raise HTTPException(status_code=400, detail="Phone number is required")
+        job = pipeline.create_job(request.to_phone_number)
+        await save_pipeline_job(job)
+        pipeline.start_pipeline(
+            job,
+            request.prompt,
+            generate_script=request.generate_script,
+            voice_name=request.voice,
+            output_format=request.output_format,
+            on_call_placed=record_call,
+            on_update=save_pipeline_job,
+        )
+        return {"job_id": job["job_id"], "status": job["status"]}
+
+    @app.get("/pipeline/{job_id}")
+    async def call_get_pipeline_job(
+        job_id: str, api_key: str = Depends(verify_api_key)
+    ):
+        """Status and per-stage timings of a pipeline job"""
+        # Jobs started by another worker are read from the shared store
+        job = pipeline.get_job(job_id) or await call_store.get_state("pipeline_job", job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+
 print("All functionality loaded successfully")
 print("Application startup complete")
@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import asyncio
+import random
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Fraction of hot-path events (streamed chunks, per-call summaries) written
+# as JSON log lines; 0 disables them, 1 logs everything
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Latency buckets in seconds, from fast local work to slow TTS requests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Where workers share their samples so any worker can serve /metrics for
+# all of them ("" keeps metrics per process), and how often they are written
+METRICS_DIR = os.getenv("METRICS_DIR", "/tmp/answering-machine/metrics")
+METRICS_WRITE_INTERVAL = float(os.getenv("METRICS_WRITE_INTERVAL", "5"))
+
+REGISTRY = []
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class: a named metric family with optional labels.
+
+    ``collect()`` returns this worker's series as ``{label values: value}``;
+    ``render(series)`` formats series, possibly merged from several workers.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def merge(self, total, value):
+        return total + value
+
+    def render(self, series):
+        return self.header() + [
+            f"{self.name}{format_labels(self.labelnames, key)} {value}"
+            for key, value in series.items()
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from ``fn()`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        super().__init__(name, help_text, labelnames)
+        self.fn = fn
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self):
+        if self.fn is not None:
+            return {(): self.fn()}
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts (last is +Inf), sum, count]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        with self._lock:
+            return {key: [list(s[0]), s[1], s[2]] for key, s in self._series.items()}
+
+    def merge(self, total, value):
+        return [
+            [a + b for a, b in zip(total[0], value[0])],
+            total[1] + value[1],
+            total[2] + value[2],
+        ]
+
+    def render(self, series):
+        lines = self.header()
+        for key, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# Multi-worker aggregation: every worker writes its samples to
+# METRICS_DIR/<pid>.json (on scrape and every METRICS_WRITE_INTERVAL
+# seconds), and /metrics sums the files, so any worker can answer a scrape.
+# Counters and histograms of exited workers are kept so totals never go
+# backwards; their gauges are dropped. Clear the directory before starting
+# the server (start.sh and the Docker image do).
+
+
+def snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f"{pid or os.getpid()}.json")
+
+
+def write_snapshot():
+    """Write this worker's samples for the other workers to merge."""
+    if not METRICS_DIR:
+        return
+    snapshot = {
+        metric.name: [[list(key), value] for key, value in metric.collect().items()]
+        for metric in REGISTRY
+    }
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = snapshot_path()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots():
+    """Samples of the other workers, as ``(alive, snapshot)`` pairs."""
+    snapshots = []
+    for entry in os.scandir(METRICS_DIR):
+        name, ext = os.path.splitext(entry.name)
+        if ext != ".json" or not name.isdigit() or int(name) == os.getpid():
+            continue
+        try:
+            with open(entry.path) as f:
+                snapshots.append((pid_alive(int(name)), json.load(f)))
+        except (OSError, ValueError):
+            # Being replaced or removed right now; skip it for this scrape
+            continue
+    return snapshots
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format.
+
+    Samples are summed across workers when METRICS_DIR is set.
+    """
+    others = []
+    if METRICS_DIR:
+        try:
+            write_snapshot()
+            others = read_snapshots()
+        except OSError as e:
+            print(f"Failed to share metrics through {METRICS_DIR}: {e}")
+    lines = []
+    for metric in REGISTRY:
+        series = metric.collect()
+        for alive, snapshot in others:
+            if metric.kind == "gauge" and not alive:
+                continue
+            for key, value in snapshot.get(metric.name, []):
+                key = tuple(key)
+                series[key] = (
+                    metric.merge(series[key], value) if key in series else value
+                )
+        lines.extend(metric.render(series))
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_writer():
+    """Periodically publish this worker's samples; run for the app's lifetime."""
+    try:
+        while True:
+            await asyncio.sleep(METRICS_WRITE_INTERVAL)
+            try:
+                await asyncio.to_thread(write_snapshot)
+            except OSError as e:
+                print(f"Failed to write metrics snapshot: {e}")
+    finally:
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Latency of upstream calls and processing stages",
+    ["stage"],
+)
+STAGE_ERRORS = Counter(
+    "stage_errors_total", "Upstream calls and processing stages that raised", ["stage"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the response headers",
+    ["method", "route", "status"],
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled")
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a block as one ``stage``, counting it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def log_event(event: str, **fields):
+    """Write a sampled structured (JSON) log line for a hot-path event."""
+    if LOG_SAMPLE_RATE <= 0 or (
+        LOG_SAMPLE_RATE < 1 and random.random() >= LOG_SAMPLE_RATE
+    ):
+        return
+    print(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by method, route and status.
+
+    Routes are labelled by their template (``/pipeline/{job_id}``), not the
+    raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status):
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
+
+        async def send_with_metrics(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                record(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            if not recorded:
+                record(500)
@@ -0,0 +1,142 @@
+import io
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import HTTPException
+
+from audio_formats import FILE_EXTENSIONS, OUTPUT_FORMATS
+from google_calls import gemini_audio_call, gemini_text_call, upload_fileobj_to_gcs
+from twilio_calls import make_twilio_call
+
+# Finished jobs beyond this count are forgotten, oldest first
+PIPELINE_MAX_JOBS = int(os.getenv("PIPELINE_MAX_JOBS", "1000"))
+
+jobs = OrderedDict()
+# Keep references to running jobs so they aren't garbage collected
+running_tasks = set()
+
+
+def create_job(to_phone_number: str) -> dict:
+    """Register a new pipeline job and return its record."""
+    now = datetime.now().isoformat()
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "queued",
+        "stage": None,
+        "to_phone_number": to_phone_number,
+        "created_at": now,
+        "updated_at": now,
+        "stages": {},
+        "result": {},
+        "error": None,
+    }
+    jobs[job["job_id"]] = job
+    while len(jobs) > PIPELINE_MAX_JOBS:
+        oldest_id = next(
+            (job_id for job_id, j in jobs.items() if j["status"] in ("completed", "failed")),
+            None,
+        )
+        if oldest_id is None:
+            break
+        del jobs[oldest_id]
+    return job
+
+
+def get_job(job_id: str):
+    return jobs.get(job_id)
+
+
+@asynccontextmanager
+async def stage(job: dict, name: str, on_update=None):
+    """Record the status and duration of one pipeline stage."""
+    job["stage"] = name
+    job["updated_at"] = datetime.now().isoformat()
+    job["stages"][name] = {"status": "running"}
+    if on_update is not None:
+        await on_update(job)
+    started = time.perf_counter()
+    try:
+        yield
+        job["stages"][name]["status"] = "completed"
+    except Exception:
+        job["stages"][name]["status"] = "failed"
+        raise
+    finally:
+        job["stages"][name]["duration_ms"] = round(
+            (time.perf_counter() - started) * 1000, 1
+        )
+        job["updated_at"] = datetime.now().isoformat()
+        if on_update is not None:
+            await on_update(job)
+
+
+async def run_pipeline(
+    job: dict,
+    prompt: str,
+    generate_script=True,
+    voice_name=None,
+    output_format="wav_mulaw_8k",
+    on_call_placed=None,
+    on_update=None,
+):
+    """Prompt -> script -> speech -> storage -> phone call, all server-side.
+
+    Audio stays in memory between stages and never goes back to the client.
+    ``on_update(job)`` is awaited whenever the job record changes.
+    """
+    job["status"] = "running"
+    started = time.perf_counter()
+    try:
+        script = prompt
+        if generate_script:
+            async with stage(job, "text", on_update):
+                response = await gemini_text_call(prompt)
+                script = response.text
+                job["result"]["script"] = script
+
+        async with stage(job, "tts", on_update):
+            audio_data = await gemini_audio_call(
+                script, voice_name, output_format=output_format
+            )
+
+        async with stage(job, "upload", on_update):
+            upload = await upload_fileobj_to_gcs(
+                io.BytesIO(audio_data),
+                FILE_EXTENSIONS[output_format],
+                OUTPUT_FORMATS[output_format],
+            )
+            job["result"]["file_name"] = upload["file_name"]
+            job["result"]["audio_file_url"] = upload["signed_url"]
+
+        async with stage(job, "call", on_update):
+            call = await make_twilio_call(job["to_phone_number"], upload["signed_url"])
+            if not call.get("success"):
+                raise RuntimeError(call.get("error") or "Failed to initiate call")
+            job["result"]["call_sid"] = call["call_sid"]
+            if on_call_placed is not None:
+                await on_call_placed(
+                    call["call_sid"], job["to_phone_number"], upload["signed_url"]
+                )
+
+        job["status"] = "completed"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = e.detail if isinstance(e, HTTPException) else str(e)
+        print(f"Pipeline job {job['job_id']} failed in {job['stage']}: {job['error']}")
+    finally:
+        job["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        job["updated_at"] = datetime.now().isoformat()
+        if on_update is not None:
+            await on_update(job)
+
+
+def start_pipeline(job: dict, *args, **kwargs):
+    """Run a pipeline job in the background."""
+    task = asyncio.create_task(run_pipeline(job, *args, **kwargs))
+    running_tasks.add(task)
+    task.add_done_callback(running_tasks.discard)
+    return task
@@ -0,0 +1,16 @@
+import os
+import json
+
+# Seconds of silence before an SSE heartbeat comment is sent
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+# Stop proxies from buffering or caching event streams
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data, event=None):
+    """Format a payload as a Server-Sent Events message."""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
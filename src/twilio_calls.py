@@ -1,9 +1,13 @@
 import os
-import requests
 from twilio.rest import Client
+from twilio.http.async_http_client import AsyncTwilioHttpClient
 from twilio.twiml.voice_response import VoiceResponse
 from fastapi import HTTPException
 
+from caching import SingleFlight, TTLCache
+from callbacks import TERMINAL_STATUSES
+from metrics import stage_timer
+
 account_sid = os.getenv("TWILIO_ACCOUNT_SID")
 auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 twilio_phone_number = os.getenv("TWILIO_PHONE_NUMBER")
@@ -13,18 +17,70 @@ print(f"TWILIO_ACCOUNT_SID present: {bool(account_sid)}")
 print(f"TWILIO_AUTH_TOKEN present: {bool(auth_token)}")
 print(f"TWILIO_PHONE_NUMBER present: {bool(twilio_phone_number)}")
 
-# Only create client if credentials are available
-if account_sid and auth_token:
-    client = Client(account_sid, auth_token)
-else:
-    client = None
+# Status changes Twilio reports to our callback URL
+STATUS_CALLBACK_EVENTS = ["initiated", "ringing", "answered", "completed"]
+TWILIO_TIMEOUT = float(os.getenv("TWILIO_TIMEOUT", "15"))
+
+# Call-status lookups: finished calls never change, live ones change quickly,
+# and unknown SIDs are remembered briefly so pollers don't hammer Twilio
+CALL_STATUS_TTL_TERMINAL = float(os.getenv("CALL_STATUS_TTL_TERMINAL", "3600"))
+CALL_STATUS_TTL_ACTIVE = float(os.getenv("CALL_STATUS_TTL_ACTIVE", "2"))
+CALL_STATUS_TTL_NOT_FOUND = float(os.getenv("CALL_STATUS_TTL_NOT_FOUND", "30"))
+call_status_cache = TTLCache(
+    int(os.getenv("CALL_STATUS_CACHE_ITEMS", "10000")), CALL_STATUS_TTL_ACTIVE
+)
+call_status_flights = SingleFlight()
+
+if not (account_sid and auth_token):
     print("WARNING: Twilio credentials not configured")
 
+# Shared Twilio client over a pooled keep-alive aiohttp session. The session
+# has to be created inside the running event loop, so this happens on app
+# startup (or first use) rather than at import.
+client = None
+twilio_http_client = None
+
+
+def init_twilio_client():
+    """Create the shared async Twilio client if credentials are available."""
+    global client, twilio_http_client
+    if client is not None or not (account_sid and auth_token):
+        return client
+    twilio_http_client = AsyncTwilioHttpClient(timeout=TWILIO_TIMEOUT)
+    client = Client(account_sid, auth_token, http_client=twilio_http_client)
+    print("Twilio client initialized")
+    return client
+
+
+async def warm_twilio_client():
+    """Open a pooled connection to the Twilio API before traffic arrives."""
+    client = init_twilio_client()
+    if client is None:
+        return
+    try:
+        await client.api.v2010.accounts(account_sid).fetch_async()
+        print("Twilio connection warmed")
+    except Exception as e:
+        print(f"Twilio warm-up failed: {e}")
+
 
-def get_twilio_status():
+async def close_twilio_client():
+    """Close the shared Twilio connection pool."""
+    global client, twilio_http_client
+    if twilio_http_client is not None:
+        await twilio_http_client.close()
+    client = None
+    twilio_http_client = None
+
+
+async def get_twilio_status():
     """Get Twilio account status and information"""
+    client = init_twilio_client()
+    if not client:
+        raise HTTPException(status_code=500, detail="Twilio credentials not configured")
     try:
-        account = client.api.v2010.accounts(account_sid).fetch()
+        with stage_timer("twilio_account"):
+            account = await client.api.v2010.accounts(account_sid).fetch_async()
 
         print(f"✓ Authentication successful!")
         print(f"Account Name: {account.friendly_name}")
@@ -63,6 +119,7 @@ def generate_twiml_for_call(audio_file_url: str) -> str:
 
 async def make_twilio_call(to_phone_number: str, audio_file_url: str) -> str:
     """Make Twilio Phone call with the provided audio file URL."""
+    client = init_twilio_client()
     if not client:
         raise HTTPException(status_code=500, detail="Twilio credentials not configured")
 
@@ -71,26 +128,30 @@ async def make_twilio_call(to_phone_number: str, audio_file_url: str) -> str:
     if not audio_file_url:
         raise ValueError("Audio File URL not set.")
     twiml_xml = generate_twiml_for_call(audio_file_url)
+    # Twilio includes the CallSid in every callback, so one shared callback
+    # URL can be attached when the call is created (one round trip per call)
+    status_callback = {}
+    if os.getenv("API_URL"):
+        status_callback = {
+            "status_callback": f"{os.getenv('API_URL')}/twilio/call/status",
+            "status_callback_method": "POST",
+            "status_callback_event": STATUS_CALLBACK_EVENTS,
+        }
     try:
-        # Create the call without status_callback first
-        call = client.calls.create(
-            to=to_phone_number,
-            from_=twilio_phone_number,
-            twiml=twiml_xml,
-        )
-
-        # Now update the call with the status_callback that includes the call SID
-        call = client.calls(call.sid).update(
-            status_callback_method="POST",
-            status_callback=f"{os.getenv('API_URL')}/twilio/call/{call.sid}/status",
-        )
-
+        with stage_timer("twilio_create_call"):
+            call = await client.calls.create_async(
+                to=to_phone_number,
+                from_=twilio_phone_number,
+                twiml=twiml_xml,
+                **status_callback,
+            )
         print(f"Call initiated with SID: {call.sid}")
     except Exception as e:
         print(f"Failed to initiate call: {e}")
         return {
             "success": False,
             "error": str(e),
+            "status_code": getattr(e, "status", None),
             "message": "Failed to initiate call",
         }
     return {
@@ -101,8 +162,9 @@ async def make_twilio_call(to_phone_number: str, audio_file_url: str) -> str:
     }
 
 
-def get_call_status(call_sid: str):
+async def get_call_status(call_sid: str):
     """Get status of a specific Twilio call"""
+    client = init_twilio_client()
     if not client:
         return {
             "success": False,
@@ -111,13 +173,14 @@ def get_call_status(call_sid: str):
         }
 
     try:
-        call = client.calls(call_sid).fetch()
+        with stage_timer("twilio_fetch_call"):
+            call = await client.calls(call_sid).fetch_async()
         return {
             "success": True,
             "call_sid": call.sid,
             "status": call.status,
             "direction": call.direction,
-            "from_": call.from_,
+            "from_": call._from,
             "to": call.to,
             "duration": call.duration,
             "price": call.price,
@@ -135,5 +198,45 @@ def get_call_status(call_sid: str):
         return {
             "success": False,
             "error": str(e),
+            "status_code": getattr(e, "status", None),
             "message": f"Failed to fetch call status for {call_sid}",
         }
+
+
+def call_status_ttl(result: dict):
+    """How long a get_call_status result may be served from cache, or None."""
+    if result.get("success"):
+        if result["status"] in TERMINAL_STATUSES:
+            return CALL_STATUS_TTL_TERMINAL
+        return CALL_STATUS_TTL_ACTIVE
+    if result.get("status_code") == 404:
+        return CALL_STATUS_TTL_NOT_FOUND
+    # Other failures (auth, network, throttling) are not cached
+    return None
+
+
+async def lookup_call_status(call_sid: str, on_fetched=None):
+    """Cached, coalesced get_call_status.
+
+    Concurrent lookups for the same SID share one Twilio request.
+    ``on_fetched(result)`` is awaited once per successful upstream fetch,
+    e.g. to write the record back to local storage.
+    """
+    cached = call_status_cache.get(call_sid)
+    if cached is not None:
+        return {**cached, "source": "cache"}
+
+    async def fetch():
+        result = await get_call_status(call_sid)
+        ttl = call_status_ttl(result)
+        if ttl is not None:
+            call_status_cache.set(call_sid, result, ttl)
+        if result.get("success") and on_fetched is not None:
+            try:
+                await on_fetched(result)
+            except Exception as e:
+                print(f"Failed to store fetched status for call {call_sid}: {e}")
+        return result
+
+    result, _ = await call_status_flights.do(call_sid, fetch)
+    return {**result, "source": "twilio"}
@@ -0,0 +1,73 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+UPLOAD_INDEX_PATH = os.getenv(
+    "UPLOAD_INDEX_PATH", "/tmp/answering-machine/upload_index.db"
+)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_obj):
+    """SHA-256 and size of a seekable file object, read in chunks.
+
+    Leaves the file positioned at the start so it can be uploaded next.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest(), size
+
+
+class UploadIndex:
+    """Local SQLite index of uploaded objects, keyed by content hash."""
+
+    def __init__(self, path=UPLOAD_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS uploads (
+                content_hash TEXT NOT NULL,
+                file_extension TEXT NOT NULL,
+                object_name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (content_hash, file_extension)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, content_hash, file_extension):
+        """Object name previously stored for this content, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT object_name FROM uploads WHERE content_hash = ? AND file_extension = ?",
+                (content_hash, file_extension),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, content_hash, file_extension, object_name, size):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                (content_hash, file_extension, object_name, size, time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, content_hash, file_extension):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM uploads WHERE content_hash = ? AND file_extension = ?",
+                (content_hash, file_extension),
+            )
+            self._conn.commit()
@@ -30,7 +30,16 @@ export TWILIO_ACCOUNT_SID=${TWILIO_ACCOUNT_SID:-""}
 export TWILIO_AUTH_TOKEN=${TWILIO_AUTH_TOKEN:-""}
 export TWILIO_PHONE_NUMBER=${TWILIO_PHONE_NUMBER:-""}
 
-echo "Starting uvicorn server on port $PORT..."
+# One worker per available core unless WEB_CONCURRENCY says otherwise.
+# Workers share call records, jobs and the dev API key through files under
+# /tmp/answering-machine, so they must run on the same host.
+export WEB_CONCURRENCY=${WEB_CONCURRENCY:-$(nproc)}
+
+# Workers share metrics through per-process files; start from zero
+export METRICS_DIR=${METRICS_DIR-/tmp/answering-machine/metrics}
+[ -n "$METRICS_DIR" ] && rm -rf "$METRICS_DIR"
+
+echo "Starting uvicorn server on port $PORT with $WEB_CONCURRENCY workers..."
 
 # Start the application with better error handling
-exec uvicorn src.main:app --host 0.0.0.0 --port $PORT --workers 1 --log-level info
+exec uvicorn src.main:app --host 0.0.0.0 --port $PORT --workers $WEB_CONCURRENCY --log-level info
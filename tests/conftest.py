@@ -0,0 +1,35 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+# Modules live in src/ and are imported by bare name, as in the app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from call_store import MemoryCallStore, SQLiteCallStore  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def run_with_store(request, tmp_path):
+    """Run ``scenario(store)`` against a started store of each backend.
+
+    The store is started and stopped inside one event loop, since the SQLite
+    backend's flush task belongs to the loop that started it.
+    """
+
+    def run(scenario):
+        async def main():
+            if request.param == "memory":
+                store = MemoryCallStore()
+            else:
+                store = SQLiteCallStore(str(tmp_path / "calls.db"))
+            await store.start()
+            try:
+                return await scenario(store)
+            finally:
+                await store.stop()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,78 @@
+import asyncio
+import struct
+
+import numpy as np
+
+from audio_formats import (
+    create_wav_from_pcm,
+    pcm16_to_mulaw,
+    read_wav_pcm,
+    resample_pcm16,
+    transcode_wav,
+)
+
+
+def mulaw_to_pcm16(mulaw_data):
+    """Reference G.711 mu-law decoder."""
+    codes = ~np.frombuffer(mulaw_data, dtype=np.uint8).astype(np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = ((((codes & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    return np.where(codes & 0x80, -magnitude, magnitude)
+
+
+def tone(frequency, rate, seconds=0.5, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype("<i2").tobytes()
+
+
+def rms(pcm_data):
+    samples = np.frombuffer(pcm_data, dtype="<i2").astype(np.float64)
+    # Skip the filter's edge effects
+    return np.sqrt(np.mean(samples[100:-100] ** 2))
+
+
+def test_mulaw_round_trip_stays_within_quantization_step():
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    decoded = mulaw_to_pcm16(pcm16_to_mulaw(samples.astype("<i2").tobytes()))
+    clipped = np.clip(samples, -32635, 32635)
+    # mu-law keeps about four bits of mantissa, so error grows with magnitude
+    assert np.all(np.abs(decoded - clipped) <= np.abs(clipped) / 16 + 8)
+
+
+def test_mulaw_encodes_silence_and_sign():
+    encoded = pcm16_to_mulaw(np.array([0, 1000, -1000], dtype="<i2").tobytes())
+    assert encoded[0] == 0xFF
+    assert encoded[1] ^ encoded[2] == 0x80
+
+
+def test_resample_round_trip_keeps_a_voice_band_tone():
+    original = tone(440, 24000)
+    narrowband = resample_pcm16(original, 24000, 8000)
+    restored = resample_pcm16(narrowband, 8000, 24000)
+    assert len(narrowband) == len(original) // 3
+    assert len(restored) == len(original)
+    assert abs(rms(restored) - rms(original)) / rms(original) < 0.05
+
+
+def test_resample_non_integer_ratio():
+    narrowband = resample_pcm16(tone(440, 24000), 24000, 16000)
+    assert len(narrowband) == 2 * 8000
+    assert abs(rms(narrowband) - 8000 / np.sqrt(2)) / (8000 / np.sqrt(2)) < 0.05
+
+
+def test_downsampling_filters_tones_above_new_nyquist():
+    # 6 kHz would alias to 2 kHz at 8 kHz without the low-pass filter
+    narrowband = resample_pcm16(tone(6000, 24000), 24000, 8000)
+    assert rms(narrowband) < 0.05 * rms(tone(6000, 24000))
+
+
+def test_transcode_wav_to_telephony_mulaw():
+    pcm = tone(440, 24000)
+    wav = create_wav_from_pcm(pcm)
+    assert read_wav_pcm(wav) == (pcm, 24000)
+
+    mulaw_wav = asyncio.run(transcode_wav(wav, "wav_mulaw_8k"))
+    format_tag, channels, rate = struct.unpack("<HHI", mulaw_wav[20:28])
+    assert (format_tag, channels, rate) == (7, 1, 8000)
+    data_size = struct.unpack("<I", mulaw_wav[54:58])[0]
+    assert mulaw_wav[50:54] == b"data" and data_size == len(pcm) // 2 // 3
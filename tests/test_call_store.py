@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from call_store import decode_cursor, encode_cursor, new_call_record
+
+
+def minutes_ago(minutes):
+    # Recent enough that retention compaction on startup keeps the rows
+    return (datetime.now() - timedelta(minutes=minutes)).isoformat()
+
+
+def test_pagination_walks_past_callback_stub(run_with_store):
+    async def scenario(store):
+        first = new_call_record("CA1", "+15005550001", "https://example.com/1.wav")
+        first["created_at"] = minutes_ago(3)
+        await store.create(first)
+        # A callback for a call this worker never recorded leaves a stub
+        await store.update_status(
+            "CA2", {"status": "ringing", "updated_at": minutes_ago(2)}, 1, 0
+        )
+        last = new_call_record("CA3", "+15005550003", "https://example.com/3.wav")
+        last["created_at"] = minutes_ago(1)
+        await store.create(last)
+
+        seen, after = [], None
+        while True:
+            page = await store.list(after=after, limit=1)
+            if not page:
+                break
+            seen.append(page[0]["call_sid"])
+            after = decode_cursor(encode_cursor(page[0]))
+        return seen
+
+    assert run_with_store(scenario) == ["CA1", "CA2", "CA3"]
+
+
+def test_cursor_without_created_at_sorts_first(run_with_store):
+    async def scenario(store):
+        await store.create(new_call_record("CA1", "+15005550001", None))
+        cursor = encode_cursor({"created_at": None, "call_sid": "CA0"})
+        return await store.list(after=decode_cursor(cursor))
+
+    assert [call["call_sid"] for call in run_with_store(scenario)] == ["CA1"]
+
+
+def status(name, minutes):
+    return {"status": name, "updated_at": minutes_ago(minutes)}
+
+
+def test_late_callback_does_not_regress_status(run_with_store):
+    async def scenario(store):
+        await store.create(new_call_record("CA1", "+15005550001", None))
+        await store.update_status("CA1", status("completed", 1), 4, 3)
+        # Delivered after "completed" but sent before it
+        await store.update_status("CA1", status("ringing", 3), 2, 1)
+        await store.update_status("CA1", status("in-progress", 2), 3, 2)
+        return await store.get("CA1")
+
+    assert run_with_store(scenario)["status"] == "completed"
+
+
+def test_sequence_number_orders_callbacks_of_equal_rank(run_with_store):
+    async def scenario(store):
+        await store.create(new_call_record("CA1", "+15005550001", None))
+        await store.update_status("CA1", status("busy", 1), 4, 5)
+        await store.update_status("CA1", status("no-answer", 2), 4, 4)
+        first = (await store.get("CA1"))["status"]
+        await store.update_status("CA1", status("failed", 0), 4, 6)
+        return first, (await store.get("CA1"))["status"]
+
+    assert run_with_store(scenario) == ("busy", "failed")
+
+
+def test_create_after_callback_keeps_callback_status(run_with_store):
+    async def scenario(store):
+        # The status callback reached this worker before the call was recorded
+        await store.update_status("CA1", status("ringing", 1), 2, 1)
+        await store.create(new_call_record("CA1", "+15005550001", "https://example.com/1.wav"))
+        await store.update_status("CA1", status("initiated", 2), 1, 0)
+        return await store.get("CA1")
+
+    call = run_with_store(scenario)
+    assert call["status"] == "ringing"
+    assert call["to_phone_number"] == "+15005550001"
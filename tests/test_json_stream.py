@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from json_stream import IncrementalJSONObject
+
+TEXT = '```json\n{"category": "sales", "score": 12.5, "tags": ["a", "}"], "brief": "say \\"hi\\" {"}\n```'
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalJSONObject()
+    fields = []
+    for start in range(0, len(text), size):
+        fields.extend(parser.feed(text[start : start + size]))
+    return parser, fields
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(TEXT)])
+def test_fields_survive_any_chunk_boundary(size):
+    parser, fields = feed_in_chunks(TEXT, size)
+    expected = json.loads(TEXT[TEXT.index("{") : TEXT.rindex("}") + 1])
+    assert fields == list(expected.items())
+    assert parser.result() == expected
+
+
+def test_field_is_returned_as_soon_as_its_value_completes():
+    parser = IncrementalJSONObject()
+    assert parser.feed('{"category": "sal') == []
+    assert parser.feed('es", "brief": "') == [("category", "sales")]
+    assert parser.feed('ok"}') == [("brief", "ok")]
+
+
+def test_number_at_end_of_buffer_waits_for_delimiter():
+    parser = IncrementalJSONObject()
+    # "12" may still grow into "125"
+    assert parser.feed('{"score": 12') == []
+    assert parser.feed("5") == []
+    assert parser.feed("}") == [("score", 125)]
+    assert parser.result() == {"score": 125}
+
+
+def test_result_of_incomplete_object_raises():
+    parser = IncrementalJSONObject()
+    parser.feed('{"category": "sales"')
+    with pytest.raises(ValueError):
+        parser.result()
+
+
+def test_missing_colon_raises():
+    with pytest.raises(ValueError):
+        IncrementalJSONObject().feed('{"category" "sales"}')
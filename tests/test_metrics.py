@@ -0,0 +1,51 @@
+import os
+import json
+
+import metrics
+from metrics import Counter, Gauge, Histogram, render_metrics
+
+requests = Counter("test_requests_total", "Requests", ["route"])
+in_flight = Gauge("test_in_flight", "In flight")
+latency = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1))
+
+
+def write_worker_snapshot(directory, pid, snapshot):
+    with open(os.path.join(directory, f"{pid}.json"), "w") as f:
+        json.dump(snapshot, f)
+
+
+def sample(text, series):
+    for line in text.splitlines():
+        if not line.startswith("#") and line.rsplit(" ", 1)[0] == series:
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_render_sums_samples_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    requests.inc(route="/a")
+    in_flight.set(2)
+    latency.observe(0.5)
+
+    live_pid, dead_pid = os.getppid(), 2**22 + 1
+    for pid in (live_pid, dead_pid):
+        write_worker_snapshot(
+            tmp_path,
+            pid,
+            {
+                "test_requests_total": [[["/a"], 3]],
+                "test_in_flight": [[[], 5]],
+                "test_latency_seconds": [[[], [[1, 0, 0], 0.05, 1]]],
+            },
+        )
+
+    text = render_metrics()
+    # Counters and histograms keep the samples of exited workers
+    assert sample(text, 'test_requests_total{route="/a"}') == 1 + 3 + 3
+    assert sample(text, 'test_latency_seconds_bucket{le="0.1"}') == 2
+    assert sample(text, 'test_latency_seconds_bucket{le="1"}') == 3
+    assert sample(text, "test_latency_seconds_count") == 3
+    # Gauges only count workers that are still running
+    assert sample(text, "test_in_flight") == 2 + 5
+    # This worker's own samples were published for the others
+    assert os.path.exists(tmp_path / f"{os.getpid()}.json")